@@ -1,12 +1,20 @@
 import streamlit as st
 import pandas as pd
+import itertools
 import os
 import platform
-from collections import Counter
-from konlpy.tag import Okt
-import google.generativeai as genai
 import plotly.express as px
-import json
+from collections import deque
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from kakao_core import load_chat_file, year_slices, source_digest, user_counts, yearly_counts, wrapped_stats, get_time_of_day_label
+from kakao_dataset import ChatDataset
+from kakao_sessions import conversation_stats, format_duration, reply_speed_ranking, user_features
+from kakao_search import build_context
+from kakao_report import stream_year_report
+import kakao_cache
+import kakao_profile
+from kakao_profile import profiled, stage
+from kakao_llm import MODEL_NAME, SAMPLE_SEED, get_model, generate_json, stream_text, cached_generate, cached_stream, run_concurrent
 
 # -----------------------------------------------------------------------------
 # 1. 페이지 설정
@@ -17,81 +25,96 @@ st.set_page_config(
     layout="wide"
 )
 
+def profile_scope():
+    """계측 켜짐 여부와 기록을 세션 상태에 두어 다른 사용자의 세션과 섞이지 않게 함 (스크립트 스레드 밖에서는 None)"""
+    if get_script_run_ctx(suppress_warning=True) is None: return None
+    records = st.session_state.setdefault('profile_records', deque(maxlen=kakao_profile.MAX_RECORDS))
+    return st.session_state.get('profile_enabled', kakao_profile.ENABLED), records
+
+kakao_profile.set_scope_provider(profile_scope)
+
 # -----------------------------------------------------------------------------
 # 2. 데이터 로드 및 전처리 함수
 # -----------------------------------------------------------------------------
-@st.cache_resource
-def get_tokenizer():
-    return Okt()
-
-@st.cache_data
-def load_data(uploaded_files):
-    """CSV 파일의 헤더 위치를 자동으로 찾아서 로드하는 함수"""
-    all_data = []
-    for uploaded_file in uploaded_files:
-        try:
-            # 1. 헤더 탐색
-            try:
-                temp_df = pd.read_csv(uploaded_file, header=None)
-            except UnicodeDecodeError:
-                uploaded_file.seek(0)
-                temp_df = pd.read_csv(uploaded_file, header=None, encoding='cp949')
-
-            header_row_idx = None
-            for idx, row in temp_df.iterrows():
-                row_values = [str(val).strip() for val in row.values]
-                if 'Date' in row_values and 'User' in row_values:
-                    header_row_idx = idx
-                    break
-            
-            if header_row_idx is None: header_row_idx = 0 
-
-            # 2. 데이터 로드
-            uploaded_file.seek(0)
-            try:
-                df = pd.read_csv(uploaded_file, header=header_row_idx)
-            except UnicodeDecodeError:
-                uploaded_file.seek(0)
-                df = pd.read_csv(uploaded_file, header=header_row_idx, encoding='cp949')
-
-            # 3. 전처리
-            df.columns = [str(c).strip() for c in df.columns]
-            if 'Date' not in df.columns: continue
-
-            df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
-            df = df.dropna(subset=['Date'])
-            df['Year'] = df['Date'].dt.year
-            
-            all_data.append(df)
-            
-        except Exception as e:
-            st.error(f"파일 로드 중 오류 ({uploaded_file.name}): {e}")
-            
-    if all_data: return pd.concat(all_data, ignore_index=True)
-    return pd.DataFrame()
-
-@st.cache_data
-def extract_nouns(text_data, top_n=50):
-    """명사 추출 함수"""
-    okt = get_tokenizer()
-    nouns = []
-    if len(text_data) > 10000: text_data = text_data[:10000] # 샘플링
-
-    for text in text_data:
-        if isinstance(text, str):
-            nouns.extend([n for n in okt.nouns(text) if len(n) > 1])
-    return Counter(nouns).most_common(top_n)
+def get_file_digests(uploaded_files):
+    """업로드한 파일들의 내용 해시 (같은 업로드에 대해서는 한 번만 계산)"""
+    digests = st.session_state.setdefault('file_digests', {})
+    for f in uploaded_files:
+        if f.file_id not in digests: digests[f.file_id] = source_digest(f)
+    return [digests[f.file_id] for f in uploaded_files]
+
+def get_dataset(uploaded_files):
+    """세션의 데이터셋에 새로 올린 파일만 읽어서 붙이는 함수
+
+    기존 업로드에 새 내보내기 파일을 추가하면 그 파일에서 처음 보는 메시지만 처리합니다 (겹치는 기간은 한 번만 셈).
+    파일을 뺀 경우에는 처음부터 다시 합칩니다. 디스크 캐시를 켠 경우(KAKAO_CACHE=1) 이미 읽은 파일은 캐시에서 바로 읽습니다.
+    """
+    digests = get_file_digests(uploaded_files)
+    dataset = st.session_state.get('dataset')
+    if dataset is None or not set(dataset.sources) <= set(digests):
+        dataset = st.session_state['dataset'] = ChatDataset()
+    new_files = [(f, d) for f, d in zip(uploaded_files, digests) if d not in dataset.sources]
+    if not new_files: return dataset
+
+    with st.spinner("대화 파일 불러오는 중..."):
+        for uploaded_file, digest in new_files:
+            if digest in dataset.sources: continue  # 같은 파일을 두 번 올린 경우
+            with stage('ingest_file', memory=True, rows=len(dataset)) as record:
+                try:
+                    record['added_rows'] = dataset.add(load_chat_file(uploaded_file), digest)
+                except Exception as e:
+                    st.error(f"파일 로드 중 오류 ({uploaded_file.name}): {e}")
+                    dataset.add(None, digest)  # 같은 파일을 rerun마다 다시 읽지 않도록 처리한 것으로 기록
+    return dataset
+
+def get_noun_index(dataset):
+    """전체 메시지의 명사 인덱스 (처음 한 번 만들고 파일이 추가되면 새 메시지만 분석)"""
+    with stage('noun_index', memory=True, rows=len(dataset)), st.spinner("메시지 명사 추출 중..."):
+        return dataset.noun_index()
+
+def get_count_cube(dataset):
+    """(연도, 사용자, 날짜, 시간)별 메시지 수 집계 (파일이 추가되면 새 메시지분만 더함)"""
+    with stage('count_cube', memory=True, rows=len(dataset)):
+        return dataset.count_cube()
+
+def get_search_index(dataset):
+    """챗봇 검색용 BM25 역색인 (데이터가 바뀐 뒤 처음 챗봇을 열 때 다시 만듦)"""
+    with stage('search_index', memory=True, rows=len(dataset)), st.spinner("대화 검색 색인 만드는 중..."):
+        return dataset.search_index()
+
+def rows_of(view):
+    """연도 뷰(df.iloc 슬라이스)가 전체 데이터에서 차지하는 행 범위"""
+    index = view.index
+    if isinstance(index, pd.RangeIndex) and index.step == 1: return slice(index.start, index.stop)
+    return index.to_numpy()
+
+def extract_nouns(noun_index, rows=None, top_n=50):
+    """명사 추출 함수 (미리 만든 인덱스에서 선택한 행의 명사 빈도만 셈)"""
+    with stage('extract_nouns', rows=len(noun_index.message_codes[rows]) if rows is not None else len(noun_index), top_n=top_n):
+        return noun_index.top_nouns(rows, top_n)
 
 # -----------------------------------------------------------------------------
 # 3. UI 컴포넌트 함수들
 # -----------------------------------------------------------------------------
-def get_time_of_day_label(hour):
-    if 5 <= hour < 12: return "🌞 아침형 인간"
-    elif 12 <= hour < 18: return "☕ 오후의 수다쟁이"
-    elif 18 <= hour < 24: return "🌙 저녁형 인간"
-    else: return "🦉 올빼미족"
+VIEWS = ["🎁 Wrapped", "🎭 성격 분석", "🤖 심층 리포트", "💬 챗봇", "📊 발화량", "☁️ 키워드", "📋 데이터"]
+DATA_PAGE_SIZE = 500             # 데이터 보기에서 한 번에 보여줄 행 수
+
+def refresh_ai():
+    """사이드바에서 'AI 결과 새로 생성'을 선택했는지 여부 (선택 시 캐시를 무시하고 다시 호출)"""
+    return st.session_state.get('refresh_ai', False)
+
+def start_stream(chunks, message):
+    """첫 조각이 올 때까지 스피너를 보여주고, 첫 조각부터 이어지는 스트림을 반환 (st.write_stream에 넘김)
+
+    스트리밍 중에 보기를 바꾸면 rerun으로 다음 화면 갱신에서 중단되고, 제너레이터가 닫히면서 남은 응답은 받지 않습니다.
+    """
+    chunks = iter(chunks)
+    with st.spinner(message):
+        first = next(chunks, None)
+    return itertools.chain([first] if first is not None else [], chunks)
 
-def show_wrapped_ui(df, year, api_key=None):
+@profiled()
+def show_wrapped_ui(df, year, noun_index, count_cube, dataset_key, api_key=None):
     """[Tab 1] Wrapped (연말결산) UI"""
     st.markdown("""
     <style>
@@ -104,35 +127,39 @@ def show_wrapped_ui(df, year, api_key=None):
     .card-pink { background: linear-gradient(120deg, #f093fb 0%, #f5576c 100%); }
     .card-green { background: linear-gradient(120deg, #84fab0 0%, #8fd3f4 100%); color: #333 !important; }
     .card-gold { background: linear-gradient(120deg, #f6d365 0%, #fda085 100%); color: #333 !important; }
+    .card-purple { background: linear-gradient(120deg, #667eea 0%, #764ba2 100%); }
     .ai-tag { display: inline-block; background-color: #f0f2f6; color: #31333F; padding: 5px 15px; border-radius: 20px; margin: 5px; font-weight: bold; border: 1px solid #d0d0d0; }
     </style>
     """, unsafe_allow_html=True)
 
-    # 데이터 계산
-    total_msgs = len(df)
-    daily_counts = df['Date'].dt.date.value_counts()
-    best_day_str, best_day_count = ("-", 0)
-    if not daily_counts.empty:
-        best_day = daily_counts.idxmax()
-        best_day_count = daily_counts.max()
-        best_day_str = best_day.strftime("%m월 %d일")
+    # 데이터 계산 (미리 집계한 큐브에서 읽음)
+    stats = wrapped_stats(count_cube, year)
+    total_msgs = stats['total_msgs']
+    best_day_str, best_day_count = ("-", stats['best_day_count'])
+    if stats['best_day'] is not None: best_day_str = stats['best_day'].strftime("%m월 %d일")
 
-    hourly_counts = df['Date'].dt.hour.value_counts()
     best_hour, time_label = (0, "-")
-    if not hourly_counts.empty:
-        best_hour = hourly_counts.idxmax()
+    if stats['best_hour'] is not None:
+        best_hour = stats['best_hour']
         time_label = get_time_of_day_label(best_hour)
 
-    user_counts = df['User'].value_counts()
     mvp_user, mvp_ratio = ("-", 0)
-    if not user_counts.empty:
-        mvp_user = user_counts.idxmax()
-        mvp_ratio = int((user_counts.max() / total_msgs) * 100) if total_msgs > 0 else 0
+    if stats['mvp_user'] is not None: mvp_user, mvp_ratio = stats['mvp_user'], stats['mvp_ratio']
 
-    all_msgs = df['Message'].dropna().tolist()
-    top_nouns = extract_nouns(all_msgs, top_n=1)
+    top_nouns = extract_nouns(noun_index, rows_of(df), top_n=1)
     top_word, top_word_count = top_nouns[0] if top_nouns else ("데이터 부족", 0)
 
+    # 답장 속도 / 대화 시작 / 연속 대화일
+    with stage('conversation_stats', rows=len(df)):
+        conv = conversation_stats(df)
+    ranking = reply_speed_ranking(conv)
+    fastest_user, fastest_time = (ranking.index[0], format_duration(ranking.iloc[0])) if len(ranking) else ("-", "-")
+    slowest_user, slowest_time = (ranking.index[-1], format_duration(ranking.iloc[-1])) if len(ranking) > 1 else ("-", "-")
+    starters = conv['users']['starts']
+    starter_user, starter_count = (starters.idxmax(), int(starters.max())) if starters.max() > 0 else ("-", 0)
+    streak = conv['day_streak']
+    streak_days, streak_desc = (streak['days'], f"{streak['start']:%m/%d} ~ {streak['end']:%m/%d}") if streak else (0, "-")
+
     # UI 렌더링
     st.markdown(f"## 🎉 {year}년 우리들의 기록 (Wrapped)")
     st.markdown("---")
@@ -145,29 +172,73 @@ def show_wrapped_ui(df, year, api_key=None):
     with c4: st.markdown(f"""<div class="wrapped-card card-blue"><div class="wrapped-title">황금 시간대</div><div class="wrapped-value">{best_hour}시</div><div class="wrapped-desc">{time_label}</div></div>""", unsafe_allow_html=True)
     with c5: st.markdown(f"""<div class="wrapped-card card-pink"><div class="wrapped-title">최고의 날</div><div class="wrapped-value">{best_day_str}</div><div class="wrapped-desc">하루 {best_day_count}톡</div></div>""", unsafe_allow_html=True)
 
-    # AI 요약
-    st.markdown("### 🤖 AI 키워드 요약")
-    if api_key and st.button("✨ 주제 분석 보기"):
-        with st.spinner("Gemini 2.0 분석 중..."):
-            try:
-                genai.configure(api_key=api_key)
-                model = genai.GenerativeModel('gemini-2.5-flash')
-                sample_size = min(150, len(df))
-                sample = df['Message'].dropna().sample(sample_size).tolist() if sample_size > 0 else []
-                prompt = f"다음 카톡 대화({year}년)에서 핵심 주제 5가지를 뽑아 '주제1, 주제2' 형태로 콤마로만 구분해줘: {sample}"
-                response = model.generate_content(prompt)
-                topics = response.text.replace("\n", "").split(",")
-                
-                tags_html = ""
-                for t in topics:
-                    clean_t = t.strip().replace("'", "").replace('"', "")
-                    if clean_t:
-                        tags_html += f"<span class='ai-tag'># {clean_t}</span>"
+    c6, c7, c8, c9 = st.columns(4)
+    with c6: st.markdown(f"""<div class="wrapped-card card-purple"><div class="wrapped-title">⚡ 3초컷 답장왕</div><div class="wrapped-value">{fastest_user}</div><div class="wrapped-desc">답장까지 보통 {fastest_time}</div></div>""", unsafe_allow_html=True)
+    with c7: st.markdown(f"""<div class="wrapped-card card-dark"><div class="wrapped-title">🐢 느긋한 답장러</div><div class="wrapped-value">{slowest_user}</div><div class="wrapped-desc">답장까지 보통 {slowest_time}</div></div>""", unsafe_allow_html=True)
+    with c8: st.markdown(f"""<div class="wrapped-card card-blue"><div class="wrapped-title">🗣 대화 시작 요정</div><div class="wrapped-value">{starter_user}</div><div class="wrapped-desc">대화 {conv['conversations']:,}번 중 {starter_count:,}번 시작</div></div>""", unsafe_allow_html=True)
+    with c9: st.markdown(f"""<div class="wrapped-card card-pink"><div class="wrapped-title">🔥 연속 대화</div><div class="wrapped-value">{streak_days}일</div><div class="wrapped-desc">{streak_desc}</div></div>""", unsafe_allow_html=True)
 
-                st.markdown(f"<div style='text-align: center; margin: 10px 0;'>{tags_html}</div>", unsafe_allow_html=True)
-            except Exception as e: st.error(f"오류: {e}")
+    show_topic_summary(df, year, dataset_key, api_key)
 
-def show_personality_analysis(df, api_key):
+@st.fragment
+def show_topic_summary(df, year, dataset_key, api_key):
+    """[Tab 1] AI 키워드 요약 (버튼을 눌러도 이 부분만 다시 실행)"""
+    st.markdown("### 🤖 AI 키워드 요약")
+    if api_key and st.button("✨ 주제 분석 보기"):
+        try:
+            model = get_model(api_key)
+            messages = df['Message'].dropna()
+            sample_size = min(150, len(messages))
+            sample = messages.sample(sample_size, random_state=SAMPLE_SEED).tolist() if sample_size > 0 else []
+            prompt = f"다음 카톡 대화({year}년)에서 핵심 주제 5가지를 뽑아 '주제1, 주제2' 형태로 콤마로만 구분해줘: {sample}"
+            # 받는 대로 먼저 보여주고, 다 받으면 같은 자리를 태그로 바꿈
+            placeholder = st.empty()
+            text = placeholder.write_stream(start_stream(
+                cached_stream(('topics', MODEL_NAME, dataset_key, year, SAMPLE_SEED, prompt),
+                              lambda: stream_text(model, prompt), refresh=refresh_ai()), "Gemini 분석 중..."))
+            topics = text.replace("\n", "").split(",")
+            
+            tags_html = ""
+            for t in topics:
+                clean_t = t.strip().replace("'", "").replace('"', "")
+                if clean_t:
+                    tags_html += f"<span class='ai-tag'># {clean_t}</span>"
+
+            placeholder.markdown(f"<div style='text-align: center; margin: 10px 0;'>{tags_html}</div>", unsafe_allow_html=True)
+        except Exception as e: st.error(f"오류: {e}")
+
+def build_persona_prompt(user, user_msgs, features=""):
+    habits = f"\n    실제로 측정한 '{user}' 님의 대화 습관: {features}\n    보유 스킬과 설명은 가능하면 이 수치를 근거로 만들어주세요." if features else ""
+    return f"""
+    당신은 '예리하고 유머러스한 심리 분석가'입니다. 다음은 '{user}' 님의 대화입니다: {user_msgs}{habits}
+    친구들이 보고 '빵 터질 수 있는' 재미있는 프로필을 만들어주세요. 전화번호, 계좌번호, 아이디 및 비밀번호 등 민감한 개인정보는 제외해주세요. JSON 포맷만 출력하세요:
+    {{
+        "title": "웃긴 RPG 칭호 (예: 팩트살인마)",
+        "mbti": "예상 MBTI와 짧은 이유",
+        "animal": "동물 이모지 1개",
+        "keywords": ["태그1", "태그2"],
+        "skill": "종특/특수능력 (예: 읽씹하기)",
+        "desc": "3문장 요약 설명"
+    }}
+    """
+
+def persona_card_html(user, data):
+    tags_html = "".join([f"<span class='persona-tag'>#{k}</span>" for k in data.get('keywords', [])])
+    return f"""
+    <div class="persona-card">
+        <span class="persona-animal">{data.get('animal', '👤')}</span>
+        <div class="persona-name">{user}</div>
+        <div class="persona-title">{data.get('title', '알 수 없음')}</div>
+        <div class="persona-mbti">🧠 {data.get('mbti', '분석 불가')}</div>
+        <div>{tags_html}</div>
+        <div class="persona-skill">⚡ 보유 스킬: {data.get('skill', '능력 없음')}</div>
+        <div class="persona-desc">{data.get('desc', '설명이 없습니다.')}</div>
+    </div>
+    """
+
+@st.fragment
+@profiled()
+def show_personality_analysis(df, year, dataset_key, api_key):
     """[Tab 2] 사용자별 성격 분석 UI (RPG 스타일)"""
     st.subheader("🎭 AI가 본 '부캐' 프로필")
     st.info("💡 대화 내용을 바탕으로 MBTI, 숨겨진 특수 능력, 그리고 한 줄 평을 분석합니다.")
@@ -176,17 +247,17 @@ def show_personality_analysis(df, api_key):
         st.warning("Gemini API Key가 설정되지 않았습니다. Streamlit Secrets에 API Key를 추가해주세요.")
         return
 
-    top_users = df['User'].value_counts().head(3).index.tolist()
-    all_users = df['User'].unique().tolist()
-    selected_users = st.multiselect("분석할 멤버 선택 (최대 4명 권장)", all_users, default=top_users)
+    # User는 전체 기간의 category라서 이 연도에 메시지가 없는 사람은 빼고 선택지를 만듦
+    counts = df['User'].value_counts()
+    all_users = counts[counts > 0].index.tolist()
+    selected_users = st.multiselect("분석할 멤버 선택 (최대 4명 권장)", all_users, default=all_users[:3])
 
     if st.button("🕵️ 프로필 분석 시작"):
         if not selected_users:
             st.warning("멤버를 선택해주세요.")
             return
 
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-2.5-flash')
+        model = get_model(api_key)
 
         # CSS
         st.markdown("""
@@ -204,98 +275,67 @@ def show_personality_analysis(df, api_key):
 
         progress_bar = st.progress(0)
         cols = st.columns(2)
-        
+        with stage('conversation_stats', rows=len(df)):
+            conv = conversation_stats(df)
+
+        # 멤버별 프롬프트를 먼저 만들고 카드 자리를 잡아둔 뒤 동시에 요청
+        jobs, slots = [], {}
         for idx, user in enumerate(selected_users):
             col = cols[idx % 2]
-            with col:
-                with st.spinner(f"'{user}'님의 영혼을 들여다보는 중..."):
-                    user_df = df[df['User'] == user]['Message'].dropna()
-                    if len(user_df) == 0:
-                        st.warning(f"{user}님의 메시지가 없습니다.")
-                        continue
-                    
-                    # 샘플 크기를 실제 데이터 크기와 비교
-                    sample_size = min(120, len(user_df))
-                    user_msgs = user_df.sample(sample_size).tolist()
-
-                    prompt = f"""
-                    당신은 '예리하고 유머러스한 심리 분석가'입니다. 다음은 '{user}' 님의 대화입니다: {user_msgs}
-                    친구들이 보고 '빵 터질 수 있는' 재미있는 프로필을 만들어주세요. 전화번호, 계좌번호, 아이디 및 비밀번호 등 민감한 개인정보는 제외해주세요. JSON 포맷만 출력하세요:
-                    {{
-                        "title": "웃긴 RPG 칭호 (예: 팩트살인마)",
-                        "mbti": "예상 MBTI와 짧은 이유",
-                        "animal": "동물 이모지 1개",
-                        "keywords": ["태그1", "태그2"],
-                        "skill": "종특/특수능력 (예: 읽씹하기)",
-                        "desc": "3문장 요약 설명"
-                    }}
-                    """
-                    try:
-                        response = model.generate_content(prompt)
-                        clean_text = response.text.replace("```json", "").replace("```", "").strip()
-                        data = json.loads(clean_text)
-                        
-                        tags_html = "".join([f"<span class='persona-tag'>#{k}</span>" for k in data.get('keywords', [])])
-                        
-                        st.markdown(f"""
-                        <div class="persona-card">
-                            <span class="persona-animal">{data.get('animal', '👤')}</span>
-                            <div class="persona-name">{user}</div>
-                            <div class="persona-title">{data.get('title', '알 수 없음')}</div>
-                            <div class="persona-mbti">🧠 {data.get('mbti', '분석 불가')}</div>
-                            <div>{tags_html}</div>
-                            <div class="persona-skill">⚡ 보유 스킬: {data.get('skill', '능력 없음')}</div>
-                            <div class="persona-desc">{data.get('desc', '설명이 없습니다.')}</div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    except Exception as e:
-                        st.error(f"{user}: 분석 실패 - {str(e)}")
-            progress_bar.progress((idx + 1) / len(selected_users))
+            user_df = df[df['User'] == user]['Message'].dropna()
+            if len(user_df) == 0:
+                with col: st.warning(f"{user}님의 메시지가 없습니다.")
+                continue
+
+            # 샘플 크기를 실제 데이터 크기와 비교
+            sample_size = min(120, len(user_df))
+            user_msgs = user_df.sample(sample_size, random_state=SAMPLE_SEED).tolist()
+            slots[user] = col.empty()
+            slots[user].info(f"'{user}'님의 영혼을 들여다보는 중...")
+            jobs.append((user, build_persona_prompt(user, user_msgs, user_features(conv, user))))
+
+        # 응답이 도착하는 순서대로 카드 렌더링 (한 명이 실패해도 나머지는 계속 진행)
+        refresh = refresh_ai()
+        def analyze(job):
+            user, prompt = job
+            return cached_generate(('persona', MODEL_NAME, dataset_key, year, user, SAMPLE_SEED, prompt),
+                                   lambda: generate_json(model, prompt), refresh=refresh)
+
+        for done, ((user, _), data, error) in enumerate(run_concurrent(analyze, jobs), start=1):
+            if error: slots[user].error(f"{user}: 분석 실패 - {str(error)}")
+            else: slots[user].markdown(persona_card_html(user, data), unsafe_allow_html=True)
+            progress_bar.progress(done / len(jobs))
         progress_bar.empty()
 
+@st.fragment
+@profiled()
 def show_ai_report_ui(df, year, api_key):
     """[Tab 3] AI 심층 리포트"""
     st.subheader(f"🤖 Gemini가 분석한 {year}년 심층 리포트")
-    st.info("💡 대화 전체 흐름을 파악하여 분위기, 관심사, 총평을 요약합니다.")
+    st.info("💡 한 해 대화를 주 단위로 요약한 뒤 합쳐서 분위기, 관심사, 총평을 정리합니다.")
     
     if not api_key:
         st.warning("Gemini API Key가 설정되지 않았습니다. Streamlit Secrets에 API Key를 추가해주세요.")
     else:
         if st.button("📑 심층 리포트 생성하기"):
-            with st.spinner("AI가 대화 내용을 정밀 분석 중입니다..."):
-                try:
-                    genai.configure(api_key=api_key)
-                    model = genai.GenerativeModel('gemini-2.5-flash')
-                    
-                    # 샘플링 (토큰 제한 고려)
-                    sample_size = min(200, len(df))
-                    sample_messages = df['Message'].dropna().sample(sample_size).tolist() if sample_size > 0 else []
-                    
-                    prompt = f"""
-                    당신은 전문 데이터 분석가입니다. 다음은 {year}년도의 카카오톡 대화방 샘플 데이터입니다. 
-                    
-                    대화 샘플: {sample_messages}
-                    전화번호, 계좌번호, 아이디 및 비밀번호 등 민감한 개인정보는 제외해주세요.
-                    
-                    위 내용을 바탕으로 다음 3가지를 분석해서 마크다운 형식으로 깔끔하게 보고서를 작성해주세요:
-                    
-                    1. 🗣️ **전반적인 대화의 분위기**
-                       - 대화가 주로 어떤 톤인지 (유머러스, 진지함, 정보공유, 잡담 등)
-                    
-                    2. 🔥 **주요 관심사나 주제**
-                       - 이들이 가장 많이 이야기한 토픽 3~4가지를 구체적으로 설명
-                    
-                    3. 📝 **한 줄 총평**
-                       - 이 해의 대화를 아우르는 멋진 한 줄 요약
-                    """
-                    
-                    response = model.generate_content(prompt)
-                    st.markdown(response.text)
-                    
-                except Exception as e:
-                    st.error(f"API 호출 중 에러 발생: {e}")
+            try:
+                model = get_model(api_key)
+
+                # 주 단위로 나눠 동시에 요약한 뒤 합쳐서 한 해 전체를 반영 (요약은 기간별로 캐시)
+                # 최종 리포트는 받는 대로 화면에 그림
+                progress_bar = st.progress(0)
+                report = stream_year_report(model, df, year, refresh=refresh_ai(),
+                                            on_progress=lambda done, total: progress_bar.progress(done / total))
+                chunks = start_stream(report, "AI가 대화 내용을 정밀 분석 중입니다...")
+                progress_bar.empty()
+                st.write_stream(chunks)
+                
+            except Exception as e:
+                st.error(f"API 호출 중 에러 발생: {e}")
 
-def show_chatbot_ui(df, api_key):
+@st.fragment
+@profiled()
+def show_chatbot_ui(df, search_index, api_key):
     """[Tab 4] 대화 검색 챗봇"""
     st.subheader("💬 대화 내용 검색 챗봇")
     st.info("💡 업로드한 카카오톡 대화 내용을 기반으로 질문에 답변합니다. (예: '누가 여기 가자고 했어?', '언제 만나기로 했지?')")
@@ -324,55 +364,106 @@ def show_chatbot_ui(df, api_key):
         
         # AI 응답 생성
         with st.chat_message("assistant"):
-            with st.spinner("대화 내용을 검색하는 중..."):
-                try:
-                    genai.configure(api_key=api_key)
-                    model = genai.GenerativeModel('gemini-2.5-flash')
-                    
-                    # 관련 대화 검색 (전체 데이터 사용, 최대 500개)
-                    sample_size = min(500, len(df))
-                    
-                    # 날짜, 사용자, 메시지 정보를 포함한 컨텍스트 생성
-                    context_data = []
-                    for _, row in df.sample(sample_size).iterrows():
-                        date_str = row['Date'].strftime('%Y-%m-%d %H:%M') if pd.notna(row['Date']) else '날짜 없음'
-                        user = row['User'] if pd.notna(row['User']) else '알 수 없음'
-                        message = row['Message'] if pd.notna(row['Message']) else ''
-                        context_data.append(f"[{date_str}] {user}: {message}")
-                    
-                    context = "\n".join(context_data)
-                    
-                    prompt = f"""
-                    당신은 카카오톡 대화 내용을 분석하는 전문 어시스턴트입니다.
-                    아래는 실제 대화 내용입니다:
-                    
-                    {context}
-                    
-                    사용자의 질문: {user_question}
-                    
-                    위 대화 내용을 바탕으로 사용자의 질문에 정확하고 친절하게 답변해주세요.
-                    답변할 때는:
-                    1. 관련된 대화 내용을 구체적으로 인용해주세요
-                    2. 누가, 언제, 무엇을 말했는지 명확하게 알려주세요
-                    3. 관련 내용이 여러 개라면 모두 알려주세요
-                    4. 대화 내용에서 찾을 수 없다면 솔직하게 "해당 내용을 찾을 수 없습니다"라고 답변해주세요
-                    5. 전화번호, 계좌번호, 아이디 및 비밀번호 등 민감한 개인정보는 제외해주세요.
-                    """
-                    
-                    response = model.generate_content(prompt)
-                    answer = response.text
-                    
-                    st.markdown(answer)
-                    st.session_state.chat_history.append({"role": "assistant", "content": answer})
-                    
-                except Exception as e:
-                    error_msg = f"오류가 발생했습니다: {str(e)}"
-                    st.error(error_msg)
-                    st.session_state.chat_history.append({"role": "assistant", "content": error_msg})
+            try:
+                model = get_model(api_key)
+                
+                # 질문과 관련된 메시지와 앞뒤 대화를 색인에서 검색 (날짜, 사용자, 메시지 포함)
+                with stage('chat_context', rows=len(df)) as record:
+                    context = build_context(search_index, user_question, rows=rows_of(df))
+                    record['context_chars'] = len(context)
+                
+                prompt = f"""
+                당신은 카카오톡 대화 내용을 분석하는 전문 어시스턴트입니다.
+                아래는 실제 대화 내용입니다:
+                
+                {context}
+                
+                사용자의 질문: {user_question}
+                
+                위 대화 내용을 바탕으로 사용자의 질문에 정확하고 친절하게 답변해주세요.
+                답변할 때는:
+                1. 관련된 대화 내용을 구체적으로 인용해주세요
+                2. 누가, 언제, 무엇을 말했는지 명확하게 알려주세요
+                3. 관련 내용이 여러 개라면 모두 알려주세요
+                4. 대화 내용에서 찾을 수 없다면 솔직하게 "해당 내용을 찾을 수 없습니다"라고 답변해주세요
+                5. 전화번호, 계좌번호, 아이디 및 비밀번호 등 민감한 개인정보는 제외해주세요.
+                """
+                
+                # 답변은 받는 대로 바로 표시
+                answer = st.write_stream(start_stream(stream_text(model, prompt), "대화 내용을 검색하는 중..."))
+                st.session_state.chat_history.append({"role": "assistant", "content": answer})
+                
+            except Exception as e:
+                error_msg = f"오류가 발생했습니다: {str(e)}"
+                st.error(error_msg)
+                st.session_state.chat_history.append({"role": "assistant", "content": error_msg})
     
     # 대화 초기화 버튼
     if st.button("🔄 대화 내용 초기화"):
         st.session_state.chat_history = []
+        st.rerun(scope="fragment")
+
+@profiled()
+def show_speaker_ui(count_cube, year):
+    """[Tab 5] 사용자별 발화량"""
+    st.subheader("사용자별 통계")
+    uc = user_counts(count_cube, year).reset_index()
+    uc.columns = ['User', 'Count']
+    st.plotly_chart(px.bar(uc, x='User', y='Count', color='User'), use_container_width=True)
+
+    st.subheader("연도별 추이")
+    yc = yearly_counts(count_cube).reset_index()
+    yc.columns = ['Year', 'Count']
+    st.plotly_chart(px.bar(yc, x='Year', y='Count'), use_container_width=True)
+
+@st.fragment
+@profiled()
+def show_keyword_ui(df, noun_index):
+    """[Tab 6] 주요 키워드"""
+    st.subheader("주요 키워드")
+    if st.button("키워드 분석 시작"):
+        nouns = extract_nouns(noun_index, rows_of(df))
+        keyword_df = pd.DataFrame(nouns, columns=['단어', '빈도']).head(30)
+        
+        # 막대 그래프로 표시
+        fig = px.bar(keyword_df, x='빈도', y='단어', orientation='h',
+                    title='Top 30 키워드', 
+                    color='빈도',
+                    color_continuous_scale='Blues')
+        fig.update_layout(yaxis={'categoryorder':'total ascending'})
+        st.plotly_chart(fig, use_container_width=True)
+        
+        # 데이터프레임으로도 표시
+        st.dataframe(keyword_df, use_container_width=True)
+
+@st.fragment
+@profiled()
+def show_data_ui(df):
+    """[Tab 7] 원본 데이터 (페이지 단위로 필요한 행만 브라우저에 전송)"""
+    n_pages = max(1, -(-len(df) // DATA_PAGE_SIZE))
+    page = st.number_input("페이지", min_value=1, max_value=n_pages, value=1, step=1)
+    start = (page - 1) * DATA_PAGE_SIZE
+    end = min(start + DATA_PAGE_SIZE, len(df))
+    st.caption(f"전체 {len(df):,}개 중 {start + 1:,}~{end:,}번째 메시지 ({page}/{n_pages} 페이지)")
+    st.dataframe(df.iloc[start:end], use_container_width=True)
+
+def show_debug_panel():
+    """[사이드바] 단계별 계측 기록 (최근 기록이 위로)"""
+    st.sidebar.markdown("### 🛠 단계별 계측")
+    records = kakao_profile.records()
+    if not records:
+        st.sidebar.caption("아직 기록이 없습니다.")
+        return
+    columns = ['stage', 'seconds', 'first_token_seconds', 'peak_mb', 'rows', 'prompt_chars', 'response_chars', 'attempts',
+               'cancelled', 'error']
+    log_df = pd.DataFrame(records[::-1])
+    st.sidebar.dataframe(log_df[[c for c in columns if c in log_df.columns]], use_container_width=True)
+    if not kakao_profile.MEMORY:
+        st.sidebar.caption("최대 메모리(peak_mb)는 KAKAO_PROFILE_MEMORY=1로 실행했을 때 로드/색인 단계에서만 기록합니다.")
+    st.sidebar.download_button("📥 JSON Lines로 내보내기", kakao_profile.export_jsonl(),
+                               file_name="kakao_profile.jsonl", mime="application/jsonl")
+    if st.sidebar.button("🧹 기록 지우기"):
+        kakao_profile.clear()
         st.rerun()
 
 # -----------------------------------------------------------------------------
@@ -416,49 +507,46 @@ Gemini 내부에서 처리된 후 파기됩니다. 의심스럽다면 코드 직
 ---
 """)
 
+if kakao_cache.CACHE_ENABLED:
+    st.warning("⚠️ 이 실행 환경은 디스크 캐시(KAKAO_CACHE=1)가 켜져 있어, 업로드한 대화의 파싱 결과(메시지 전문 포함)와 "
+               f"Gemini 분석 결과(성격 분석, 리포트 등)가 서버의 `{kakao_cache.CACHE_DIR}` 폴더에 저장됩니다.")
+
+st.sidebar.checkbox("🔁 AI 결과 새로 생성 (캐시 무시)", key='refresh_ai',
+                    help="같은 대화/연도/멤버에 대한 Gemini 분석 결과는 저장해 두었다가 재사용합니다.")
+st.sidebar.checkbox("🛠 성능 디버그 패널", key='profile_enabled', value=kakao_profile.ENABLED,
+                    help="이 세션의 단계별 소요 시간, 행 수, Gemini 요청 크기를 기록합니다.")
+
 uploaded_files = st.file_uploader("📤 카카오톡 CSV 파일 업로드", type=['csv'], accept_multiple_files=True)
 
 if uploaded_files:
-    df = load_data(uploaded_files)
-    if not df.empty:
-        all_years = sorted(df['Year'].dropna().astype(int).unique())
+    with stage('load_data', files=len(uploaded_files)) as record:
+        dataset = get_dataset(uploaded_files)
+        record['rows'] = len(dataset)
+    df, dataset_key = dataset.df, dataset.key
+    if df is not None and not df.empty:
+        if dataset.duplicates:
+            st.caption(f"여러 파일에서 겹치는 메시지 {dataset.duplicates:,}개는 한 번만 셌습니다.")
+        year_rows = year_slices(df)
+        all_years = sorted(year_rows)
         if all_years:
             selected_year = st.selectbox("📅 분석할 연도 선택", all_years, index=len(all_years)-1)
-            year_df = df[df['Year'] == selected_year]
-            
-            # 탭 구성 (총 7개 - 챗봇 탭 추가)
-            tabs = st.tabs(["🎁 Wrapped", "🎭 성격 분석", "🤖 심층 리포트", "💬 챗봇", "📊 발화량", "☁️ 키워드", "📋 데이터"])
+            # 시간순 정렬된 데이터의 연속 구간이므로 복사 없이 뷰로 선택
+            year_df = df.iloc[year_rows[selected_year]]
             
-            with tabs[0]: show_wrapped_ui(year_df, selected_year, api_key)
-            with tabs[1]: show_personality_analysis(year_df, api_key)
-            with tabs[2]: show_ai_report_ui(year_df, selected_year, api_key)
-            with tabs[3]: show_chatbot_ui(year_df, api_key)  # 새로운 챗봇 탭
+            # 보기 선택: 선택된 화면만 계산 (st.tabs는 모든 탭 본문을 매번 실행함)
+            view = st.radio("보기 선택", VIEWS, horizontal=True, key='view', label_visibility='collapsed')
             
-            with tabs[4]: # 발화량
-                st.subheader("사용자별 통계")
-                uc = year_df['User'].value_counts().reset_index()
-                uc.columns = ['User', 'Count']
-                st.plotly_chart(px.bar(uc, x='User', y='Count', color='User'), use_container_width=True)
-            
-            with tabs[5]: # 키워드
-                st.subheader("주요 키워드")
-                if st.button("키워드 분석 시작"):
-                    nouns = extract_nouns(year_df['Message'].dropna().tolist())
-                    keyword_df = pd.DataFrame(nouns, columns=['단어', '빈도']).head(30)
-                    
-                    # 막대 그래프로 표시
-                    fig = px.bar(keyword_df, x='빈도', y='단어', orientation='h',
-                                title='Top 30 키워드', 
-                                color='빈도',
-                                color_continuous_scale='Blues')
-                    fig.update_layout(yaxis={'categoryorder':'total ascending'})
-                    st.plotly_chart(fig, use_container_width=True)
-                    
-                    # 데이터프레임으로도 표시
-                    st.dataframe(keyword_df, use_container_width=True)
-            
-            with tabs[6]: st.dataframe(year_df) # 원본 데이터
+            if view == "🎁 Wrapped":
+                show_wrapped_ui(year_df, selected_year, get_noun_index(dataset), get_count_cube(dataset), dataset_key, api_key)
+            elif view == "🎭 성격 분석": show_personality_analysis(year_df, selected_year, dataset_key, api_key)
+            elif view == "🤖 심층 리포트": show_ai_report_ui(year_df, selected_year, api_key)
+            elif view == "💬 챗봇": show_chatbot_ui(year_df, get_search_index(dataset), api_key)
+            elif view == "📊 발화량": show_speaker_ui(get_count_cube(dataset), selected_year)
+            elif view == "☁️ 키워드": show_keyword_ui(year_df, get_noun_index(dataset))
+            elif view == "📋 데이터": show_data_ui(year_df)
         else: st.warning("연도 정보 없음")
     else: st.warning("데이터 로드 실패")
 else: 
     st.info("👆 위의 안내에 따라 카카오톡 대화 파일을 추출한 후, CSV 파일을 업로드해주세요.")
+
+if kakao_profile.is_enabled(): show_debug_panel()
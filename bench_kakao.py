@@ -0,0 +1,211 @@
+"""카카오톡 내보내기 합성 데이터 생성기와 단계별 벤치마크
+
+    python bench_kakao.py --sizes 100000,1000000 -o bench.json
+    python bench_kakao.py --sizes 100000 --compare bench.json     # 이전 커밋 결과와 비교
+    python bench_kakao.py --sizes 100000 --tokenizers fast,okt    # 명사 추출기 속도 비교
+    python bench_kakao.py --chat export.csv --tokenizers okt,fast  # 실제 대화로 명사 추출기 속도/Okt 대비 상위 단어 일치율 비교
+"""
+import argparse
+import gc
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import kakao_core
+import kakao_nlp
+from kakao_search import build_context, build_search_index
+from kakao_sessions import conversation_stats
+
+# -----------------------------------------------------------------------------
+# 1. 합성 카카오톡 CSV 생성
+# -----------------------------------------------------------------------------
+WORDS = ['오늘', '내일', '점심', '저녁', '회의', '영화', '카페', '여행', '부산', '제주도', '주말', '생일', '선물',
+         '회사', '과제', '시험', '운동', '치킨', '피자', '맥주', '날씨', '사진', '동영상', '이모티콘', '약속',
+         '먹자', '가자', '했어', '어디', '언제', '진짜', '대박', '아니', '그래', '좋아', '몰라', '뭐해', 'ㅋㅋㅋ',
+         'ㅎㅎ', 'ㅠㅠ', '헐', '네', '응', '오케이', '고마워', '미안', '잘자', '수고했어']
+PREAMBLE = ["{room} 님과 카카오톡 대화", "저장한 날짜 : 2025-01-01 12:00:00", ""]
+
+def generate_export(path, n_messages, encoding='utf-8', n_users=30, years=3, seed=0, room="테스트방"):
+    """실제 PC 내보내기와 비슷한 CSV(앞쪽 안내 문구, Date/User/Message 헤더, 여러 줄 메시지)를 만드는 함수"""
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp(f"{2025 - years}-01-01").value // 10 ** 9
+    seconds = np.sort(rng.integers(0, years * 365 * 86400, n_messages)) + start
+    dates = pd.to_datetime(seconds, unit='s').strftime('%Y-%m-%d %H:%M:%S')
+    # 실제 단톡방처럼 몇 명이 대부분의 메시지를 보냄
+    user_weights = 1 / np.arange(1, n_users + 1)
+    users = np.array([f"멤버{i:02d}" for i in range(n_users)])[
+        rng.choice(n_users, n_messages, p=user_weights / user_weights.sum())]
+    lengths = rng.integers(1, 9, n_messages)
+    word_ids = rng.integers(0, len(WORDS), lengths.sum())
+    multiline = rng.random(n_messages) < 0.02
+
+    with open(path, 'w', encoding=encoding, newline='') as f:
+        f.write("\n".join(line.format(room=room) for line in PREAMBLE) + "\n")
+        f.write("Date,User,Message\n")
+        pos = 0
+        for i in range(n_messages):
+            text = " ".join(WORDS[w] for w in word_ids[pos:pos + lengths[i]])
+            pos += lengths[i]
+            if multiline[i]: text = f'{text}\n"{text}"'
+            f.write(f'{dates[i]},"{users[i]}","{text.replace(chr(34), chr(34) * 2)}"\n')
+    return path
+
+# -----------------------------------------------------------------------------
+# 2. 측정 유틸
+# -----------------------------------------------------------------------------
+def measure(fn, repeat=1, memory=True):
+    """fn을 실행해 (결과, 최소 소요 시간, 최대 메모리 사용량 MB)를 반환
+
+    tracemalloc은 파이썬 코드가 많은 단계를 크게 느리게 하므로 시간은 추적 없이 재고,
+    메모리는 별도로 한 번 더 실행해서 잽니다.
+    """
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+
+    peak = 0
+    if memory:
+        result = None
+        gc.collect()
+        tracemalloc.start()
+        result = fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, best, peak / 1024 ** 2
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# -----------------------------------------------------------------------------
+# 3. 단계별 벤치마크
+# -----------------------------------------------------------------------------
+QUERIES = ["누가 부산 가자고 했어?", "생일 선물 뭐 샀지?", "회의 언제 하기로 했어?"]
+
+TOP_WORDS = 50                   # 명사 추출기 비교에 쓸 상위 단어 수
+
+def bench_tokenizers(messages, backends, repeat=1, memory=True, top_n=TOP_WORDS, agreement=False):
+    """명사 추출기별 시작 시간, 처리량(과 agreement=True면 첫 번째 추출기 대비 상위 단어 일치율)을 측정
+
+    합성 데이터는 단어 목록이 정해져 있어 어느 추출기든 상위 단어가 거의 같으므로, 일치율은 실제 대화(--chat)에서만 봅니다.
+    """
+    results, reference = {}, None
+    for backend in backends:
+        try:
+            _, init_seconds, _ = measure(lambda: kakao_nlp.TOKENIZERS[backend](), 1, False)
+            noun_index, seconds, peak_mb = measure(lambda: kakao_nlp.build_noun_index(messages, backend=backend),
+                                                   repeat, memory)
+        except Exception as e:  # Okt는 JVM이 없으면 실패
+            print(f"  noun_index[{backend}] 건너뜀: {type(e).__name__}: {e}")
+            if backend == backends[0] and agreement:
+                print(f"  기준 추출기({backend})가 없어 상위 단어 일치율은 생략합니다.")
+                agreement = False
+            continue
+        result = {'seconds': round(seconds, 4), 'peak_mb': round(peak_mb, 1), 'init_seconds': round(init_seconds, 4),
+                  'msgs_per_s': round(len(messages) / seconds) if seconds else None}
+        line = f"시작 {init_seconds:.3f}s, {result['msgs_per_s']:,}개/s"
+        if agreement:
+            top = {w for w, _ in noun_index.top_nouns(top_n=top_n)}
+            if reference is None:
+                reference = top
+                line += f", 상위 {top_n}개 일치율 기준"
+            else:
+                result['top_agreement'] = round(len(top & reference) / max(len(reference), 1), 3)
+                line += f", 상위 {top_n}개 일치율 {result['top_agreement']:.0%}"
+        results[f"noun_index[{backend}]"] = result
+        print(f"  {'noun_index[' + backend + ']':<16} {seconds:8.3f}s  {peak_mb:9.1f} MB  {line}")
+    return results
+
+def bench_size(n_messages, encoding, workdir, tokenizers=(), repeat=1, memory=True):
+    """메시지 수 하나에 대해 각 단계의 시간/메모리를 측정"""
+    path = generate_export(os.path.join(workdir, f"chat_{n_messages}_{encoding}.csv"), n_messages, encoding)
+    results = {}
+
+    def record(stage, fn):
+        value, seconds, peak_mb = measure(fn, repeat, memory)
+        results[stage] = {'seconds': round(seconds, 4), 'peak_mb': round(peak_mb, 1)}
+        print(f"  {stage:<16} {seconds:8.3f}s  {peak_mb:9.1f} MB")
+        return value
+
+    df = record('load_csv', lambda: kakao_core.read_chat_csv(path))
+    kakao_core.load_chat_file(path, use_cache=True)  # 캐시 채우기
+    record('load_cached', lambda: kakao_core.load_chat_file(path, use_cache=True))
+    cube = record('count_cube', lambda: kakao_core.build_count_cube(df))
+    years = record('year_slices', lambda: kakao_core.year_slices(df))
+    record('wrapped_stats', lambda: [kakao_core.wrapped_stats(cube, y) for y in years])
+    record('conversation', lambda: conversation_stats(df))
+    index = record('search_index', lambda: build_search_index(df))
+    record('chat_context', lambda: [build_context(index, q) for q in QUERIES])
+    if tokenizers:
+        results.update(bench_tokenizers(df['Message'], tokenizers, repeat, memory))
+        noun_index = kakao_nlp.build_noun_index(df['Message'], backend=tokenizers[0])
+        record('top_nouns', lambda: [noun_index.top_nouns(rows, TOP_WORDS) for rows in years.values()])
+    os.remove(path)
+    return results
+
+def compare(current, baseline_path):
+    """이전 결과 파일과 단계별 시간 비율을 출력"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"\n비교 기준: {baseline_path} ({baseline.get('revision')})")
+    for key, stages in current['results'].items():
+        for stage, value in stages.items():
+            old = baseline['results'].get(key, {}).get(stage)
+            if not old: continue
+            ratio = value['seconds'] / old['seconds'] if old['seconds'] else float('inf')
+            print(f"  {key:<18} {stage:<16} {old['seconds']:8.3f}s -> {value['seconds']:8.3f}s  (x{ratio:.2f})")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="카카오톡 분석 단계별 벤치마크")
+    parser.add_argument('--sizes', default='100000,1000000', help="메시지 수 목록 (콤마 구분, 예: 100000,1000000,10000000)")
+    parser.add_argument('--encodings', default='utf-8,cp949', help="생성할 CSV 인코딩 목록")
+    parser.add_argument('--repeat', type=int, default=1, help="단계별 반복 횟수 (최솟값 기록)")
+    parser.add_argument('--tokenize', action='store_true', help="기본 명사 추출기(KAKAO_TOKENIZER) 단계 포함")
+    parser.add_argument('--tokenizers', help="비교할 명사 추출기 목록 (예: okt,fast, --chat에서는 첫 번째가 일치율 기준)")
+    parser.add_argument('--chat', help="합성 데이터 대신 이 카카오톡 CSV로 명사 추출기만 비교")
+    parser.add_argument('--no-memory', action='store_true', help="메모리 측정(tracemalloc) 생략")
+    parser.add_argument('-o', '--output', help="결과를 저장할 JSON 경로")
+    parser.add_argument('--compare', help="비교할 이전 결과 JSON 경로")
+    args = parser.parse_args(argv)
+    tokenizers = args.tokenizers.split(',') if args.tokenizers else [kakao_nlp.TOKENIZER] if args.tokenize else []
+
+    if args.chat:
+        df = kakao_core.read_chat_csv(args.chat)
+        print(f"[{args.chat}: {len(df):,}개 메시지]")
+        bench_tokenizers(df['Message'], tokenizers or ['okt', 'fast'], args.repeat, not args.no_memory, agreement=True)
+        return
+
+    # 캐시 단계가 이전 실행 결과를 읽지 않도록 임시 폴더 사용
+    workdir = tempfile.mkdtemp(prefix='kakao_bench_')
+    kakao_core.kakao_cache.CACHE_DIR = os.path.join(workdir, 'cache')
+
+    report = {'revision': git_revision(), 'results': {}}
+    for size in (int(s) for s in args.sizes.split(',')):
+        for encoding in args.encodings.split(','):
+            print(f"[{size:,}개 메시지, {encoding}]")
+            report['results'][f"{size}-{encoding}"] = bench_size(size, encoding, workdir, tokenizers,
+                                                                       args.repeat, not args.no_memory)
+
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        compare(report, args.compare)
+
+if __name__ == '__main__':
+    main()
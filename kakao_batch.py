@@ -0,0 +1,122 @@
+"""카카오톡 CSV 폴더를 받아 방/연도별 Wrapped 결과를 JSON으로 미리 계산하는 CLI
+
+    python kakao_batch.py exports/ -o wrapped_out/ --workers 4
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from kakao_core import build_count_cube, get_time_of_day_label, load_chat_file, user_counts, wrapped_stats, year_slices
+from kakao_sessions import conversation_stats, reply_speed_ranking
+from kakao_nlp import TOKENIZER, TOKENIZERS, build_noun_index
+
+# -----------------------------------------------------------------------------
+# 1. 방 하나 처리
+# -----------------------------------------------------------------------------
+def summarize_year(cube, noun_index, year_rows, year, top_n, conv=None):
+    """한 해의 Wrapped 결과(카드 통계, 사용자별 메시지 수, 대화 습관, 상위 단어)를 dict로 만드는 함수"""
+    stats = wrapped_stats(cube, year)
+    summary = {
+        'year': int(year),
+        'total_msgs': stats['total_msgs'],
+        'mvp_user': stats['mvp_user'],
+        'mvp_ratio': stats['mvp_ratio'],
+        'best_day': stats['best_day'].strftime('%Y-%m-%d') if stats['best_day'] is not None else None,
+        'best_day_count': stats['best_day_count'],
+        'golden_hour': stats['best_hour'],
+        'golden_hour_label': get_time_of_day_label(stats['best_hour']) if stats['best_hour'] is not None else None,
+        'user_counts': {str(u): int(c) for u, c in user_counts(cube, year).items()},
+    }
+    if conv is not None:
+        starts = conv['users']['starts']
+        summary['conversations'] = conv['conversations']
+        summary['day_streak'] = conv['day_streak']['days'] if conv['day_streak'] else 0
+        summary['reply_seconds'] = {str(u): round(float(s), 1) for u, s in reply_speed_ranking(conv).items()}
+        summary['conversation_starts'] = {str(u): int(c) for u, c in starts[starts > 0].items()}
+    if noun_index is not None:
+        summary['top_words'] = [{'word': w, 'count': c} for w, c in noun_index.top_nouns(year_rows, top_n)]
+    return summary
+
+def process_file(path, top_n=30, words=True, tokenizer=None):
+    """CSV 한 개를 읽어 연도별 결과와 단계별 소요 시간을 반환 (프로세스 풀 워커에서 실행)"""
+    timings = {}
+    start = time.perf_counter()
+    df = load_chat_file(path)
+    timings['load'] = time.perf_counter() - start
+    if df is None:  # Date/User 헤더가 없음 (빈 내보내기는 0행으로 정상 처리)
+        raise ValueError("카카오톡 대화 내보내기 형식이 아닙니다 (Date,User,Message 헤더 없음)")
+    if df.empty:
+        return {'rows': 0, 'years': {}, 'timings': timings}
+
+    t = time.perf_counter()
+    cube = build_count_cube(df)
+    timings['aggregate'] = time.perf_counter() - t
+
+    noun_index = None
+    if words:
+        t = time.perf_counter()
+        # 파일 단위로 이미 병렬 처리 중이므로 워커 안에서는 프로세스를 더 띄우지 않음
+        noun_index = build_noun_index(df['Message'], workers=1, backend=tokenizer)
+        timings['tokenize'] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    years = {y: summarize_year(cube, noun_index, rows, y, top_n, conversation_stats(df.iloc[rows]))
+             for y, rows in year_slices(df).items()}
+    timings['summarize'] = time.perf_counter() - t
+    timings['total'] = time.perf_counter() - start
+    return {'rows': len(df), 'years': years, 'timings': timings}
+
+def write_result(out_dir, room, result):
+    """방별 폴더에 연도별 JSON과 전체 요약(index.json)을 저장"""
+    room_dir = os.path.join(out_dir, room)
+    os.makedirs(room_dir, exist_ok=True)
+    for year, summary in result['years'].items():
+        with open(os.path.join(room_dir, f"{year}.json"), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    with open(os.path.join(room_dir, 'index.json'), 'w', encoding='utf-8') as f:
+        json.dump({'room': room, 'rows': result['rows'], 'years': sorted(result['years']),
+                   'timings': result['timings']}, f, ensure_ascii=False, indent=2)
+
+# -----------------------------------------------------------------------------
+# 2. CLI
+# -----------------------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="카카오톡 CSV 폴더의 Wrapped 결과를 일괄 계산합니다.")
+    parser.add_argument('input_dir', help="카카오톡 CSV 파일이 있는 폴더")
+    parser.add_argument('-o', '--output', default='wrapped_out', help="결과를 저장할 폴더 (기본: wrapped_out)")
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1, help="동시에 처리할 파일 수")
+    parser.add_argument('--top-words', type=int, default=30, help="연도별로 저장할 상위 단어 수")
+    parser.add_argument('--no-words', action='store_true', help="명사 추출(상위 단어)을 건너뜀")
+    parser.add_argument('--tokenizer', choices=list(TOKENIZERS), default=TOKENIZER,
+                        help=f"명사 추출기 (기본: {TOKENIZER}, okt는 JVM 필요)")
+    args = parser.parse_args(argv)
+
+    paths = sorted(os.path.join(args.input_dir, name) for name in os.listdir(args.input_dir)
+                   if name.lower().endswith('.csv'))
+    if not paths:
+        parser.error(f"CSV 파일이 없습니다: {args.input_dir}")
+
+    failed = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = {executor.submit(process_file, path, args.top_words, not args.no_words, args.tokenizer): path for path in paths}
+        for future in as_completed(futures):
+            path = futures[future]
+            room = os.path.splitext(os.path.basename(path))[0]
+            try:
+                result = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"[실패] {room}: {e}")
+                continue
+            write_result(args.output, room, result)
+            steps = " ".join(f"{k}={v:.2f}s" for k, v in result['timings'].items())
+            print(f"[완료] {room}: {result['rows']:,}행, {len(result['years'])}개 연도 ({steps})")
+
+    print(f"{len(paths) - failed}/{len(paths)}개 파일 처리, 전체 {time.perf_counter() - start:.2f}s")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
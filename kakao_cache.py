@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+# -----------------------------------------------------------------------------
+# 1. 캐시 설정
+# -----------------------------------------------------------------------------
+# 디스크 캐시는 직접 실행할 때만 켬 (기본 꺼짐: 업로드한 대화 내용을 서버 디스크에 남기지 않음)
+CACHE_ENABLED = os.environ.get('KAKAO_CACHE', '0') == '1'
+CACHE_DIR = os.environ.get('KAKAO_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'kakao_wrapped'))
+FRAME_CACHE_MAX_BYTES = int(os.environ.get('KAKAO_FRAME_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+LLM_CACHE_MAX_BYTES = int(os.environ.get('KAKAO_LLM_CACHE_MAX_BYTES', 50 * 1024 ** 2))
+LLM_CACHE_TTL_SECONDS = int(os.environ.get('KAKAO_LLM_CACHE_TTL', 7 * 24 * 3600))
+LLM_MEMORY_CACHE_SIZE = 256      # 프로세스 메모리에 들고 있는 응답 수
+
+# -----------------------------------------------------------------------------
+# 2. 공통 유틸
+# -----------------------------------------------------------------------------
+def content_digest(data):
+    """바이트 내용으로 캐시 키(해시)를 만드는 함수"""
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+def cache_path(kind, key, ext):
+    """캐시 종류별 하위 폴더에 있는 파일 경로를 반환"""
+    folder = os.path.join(CACHE_DIR, kind)
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, f"{key}{ext}")
+
+def touch(path):
+    """LRU 순서를 위해 마지막 사용 시각(mtime)을 갱신"""
+    try: os.utime(path)
+    except OSError: pass
+
+def atomic_write(path, write_fn):
+    """임시 파일에 쓴 뒤 교체해서 다른 프로세스가 반쯤 쓰인 파일을 읽지 않게 함"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+    try:
+        write_fn(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+        raise
+
+def evict_lru(kind, max_bytes):
+    """폴더 전체 크기가 max_bytes를 넘으면 가장 오래 안 쓴 파일부터 삭제"""
+    folder = os.path.join(CACHE_DIR, kind)
+    if not os.path.isdir(folder): return
+    entries = []
+    for name in os.listdir(folder):
+        if name.endswith('.tmp'): continue
+        try:
+            stat = os.stat(os.path.join(folder, name))
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, name))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes: break
+        try:
+            os.remove(os.path.join(folder, name))
+            total -= size
+        except OSError:
+            pass
+
+# -----------------------------------------------------------------------------
+# 3. 파싱된 대화 DataFrame 캐시 (Arrow IPC)
+# -----------------------------------------------------------------------------
+def _arrow_string_dtype(arrow_type):
+    if arrow_type in (pa.string(), pa.large_string()): return pd.StringDtype('pyarrow')
+    return None
+
+def load_frame(key):
+    """캐시된 DataFrame을 메모리 맵으로 읽어오는 함수 (없으면 None)"""
+    path = cache_path('frames', key, '.arrow')
+    if not os.path.exists(path): return None
+    try:
+        with pa.memory_map(path) as source:
+            table = pa.ipc.open_file(source).read_all()
+        touch(path)
+        # 문자열 컬럼은 object로 풀지 않고 Arrow 문자열 그대로 사용
+        return table.to_pandas(types_mapper=_arrow_string_dtype)
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+def store_frame(key, df):
+    """DataFrame을 압축 없는 Arrow IPC로 저장하고 용량 상한에 맞춰 정리"""
+    path = cache_path('frames', key, '.arrow')
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    atomic_write(path, lambda tmp: feather.write_feather(table, tmp, compression='uncompressed'))
+    evict_lru('frames', FRAME_CACHE_MAX_BYTES)
+
+# -----------------------------------------------------------------------------
+# 4. LLM 응답 캐시 (메모리 LRU + 디스크 TTL)
+# -----------------------------------------------------------------------------
+_responses = OrderedDict()
+_responses_lock = threading.Lock()
+
+def make_key(*parts):
+    """(기능, 모델, 데이터셋, 연도/사용자, 시드, 프롬프트 등)으로 안정적인 캐시 키를 만드는 함수"""
+    raw = json.dumps(parts, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def _remember(key, created, value):
+    with _responses_lock:
+        _responses[key] = (created, value)
+        _responses.move_to_end(key)
+        while len(_responses) > LLM_MEMORY_CACHE_SIZE:
+            _responses.popitem(last=False)
+
+def get_response(key):
+    """캐시된 응답을 반환 (없거나 TTL이 지났으면 None, 디스크는 KAKAO_CACHE=1일 때만 확인)"""
+    now = time.time()
+    with _responses_lock:
+        entry = _responses.get(key)
+        if entry is not None:
+            if now - entry[0] < LLM_CACHE_TTL_SECONDS:
+                _responses.move_to_end(key)
+                return entry[1]
+            del _responses[key]
+
+    if not CACHE_ENABLED: return None
+    path = cache_path('llm', key, '.json')
+    try:
+        with open(path, encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if now - entry['created'] >= LLM_CACHE_TTL_SECONDS:
+        try: os.remove(path)
+        except OSError: pass
+        return None
+    touch(path)
+    _remember(key, entry['created'], entry['value'])
+    return entry['value']
+
+def put_response(key, value):
+    """응답을 메모리에 저장하고, 디스크 캐시를 켠 경우(KAKAO_CACHE=1)에만 디스크에도 저장해서 용량 상한에 맞춰 정리
+
+    멤버 이름이 들어간 성격 분석, 연간 리포트 등이 파일로 남으므로 기본으로는 디스크에 쓰지 않습니다.
+    """
+    created = time.time()
+    _remember(key, created, value)
+    if not CACHE_ENABLED: return
+    try:
+        path = cache_path('llm', key, '.json')
+        def write(tmp):
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'created': created, 'value': value}, f, ensure_ascii=False)
+        atomic_write(path, write)
+        evict_lru('llm', LLM_CACHE_MAX_BYTES)
+    except OSError:
+        pass  # 디스크에 못 써도 메모리 캐시는 유지
@@ -0,0 +1,241 @@
+import codecs
+import csv
+import hashlib
+import io
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+import kakao_cache
+
+# -----------------------------------------------------------------------------
+# 1. CSV 로드 설정
+# -----------------------------------------------------------------------------
+SNIFF_BYTES = 64 * 1024          # 인코딩/헤더 탐색에 사용할 앞부분 크기
+CHUNK_ROWS = 200_000             # 한 번에 파싱할 행 수 (메모리 상한)
+ENCODINGS = ('utf-8', 'cp949')   # 카카오톡 PC 내보내기에서 쓰이는 인코딩
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+CHAT_COLUMNS = ['Date', 'User', 'Message']
+CACHE_VERSION = 2                # 파싱 결과 형식이 바뀌면 올려서 기존 캐시를 무효화
+
+# -----------------------------------------------------------------------------
+# 2. 인코딩 / 헤더 탐색
+# -----------------------------------------------------------------------------
+def _decode_head(head):
+    """앞부분 바이트를 디코딩해 (인코딩, 텍스트)를 반환 (잘린 멀티바이트 문자는 무시)"""
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig', head[len(codecs.BOM_UTF8):].decode('utf-8', errors='ignore')
+    for encoding in ENCODINGS:
+        try:
+            return encoding, codecs.getincrementaldecoder(encoding)().decode(head, final=False)
+        except UnicodeDecodeError:
+            continue
+    return ENCODINGS[0], head.decode(ENCODINGS[0], errors='replace')
+
+def find_header_row(text):
+    """'Date', 'User' 컬럼이 있는 헤더 줄 번호를 찾는 함수 (없으면 0)"""
+    for idx, line in enumerate(text.split('\n')):
+        try:
+            values = next(csv.reader([line]), [])
+        except csv.Error:
+            continue
+        values = [v.strip() for v in values]
+        if 'Date' in values and 'User' in values:
+            return idx
+    return 0
+
+def sniff_csv(source):
+    """파일 앞부분만 읽어 (인코딩, 헤더 줄 번호)를 추정하는 함수"""
+    head = source.read(SNIFF_BYTES)
+    source.seek(0)
+    encoding, text = _decode_head(head)
+    return encoding, find_header_row(text)
+
+# -----------------------------------------------------------------------------
+# 3. 단일 패스 로드
+# -----------------------------------------------------------------------------
+def parse_dates(values):
+    """명시적 포맷으로 날짜를 파싱하고, 포맷이 다른 값만 추론 파싱으로 재시도"""
+    parsed = pd.to_datetime(values, format=DATE_FORMAT, errors='coerce')
+    missed = parsed.isna() & values.notna()
+    if missed.any():
+        parsed[missed] = pd.to_datetime(values[missed], format='mixed', errors='coerce')
+    return parsed
+
+def _read_chunks(source, encoding, header_row_idx):
+    chunks = []
+    reader = pd.read_csv(source, skiprows=header_row_idx, header=0, encoding=encoding,
+                         chunksize=CHUNK_ROWS, dtype=str, usecols=lambda c: str(c).strip() in CHAT_COLUMNS)
+    for chunk in reader:
+        chunk.columns = [str(c).strip() for c in chunk.columns]
+        if 'Date' not in chunk.columns: return None
+        chunk = chunk.reindex(columns=CHAT_COLUMNS)
+        chunk['Date'] = parse_dates(chunk['Date'])
+        chunk = chunk.dropna(subset=['Date'])
+        chunks.append(chunk)
+    return chunks
+
+def read_chat_csv(source):
+    """카카오톡 CSV 한 개를 한 번만 파싱해서 컴팩트한 Date/User/Message DataFrame으로 반환 (Date 컬럼이 없으면 None)"""
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    elif isinstance(source, str):
+        with open(source, 'rb') as f:
+            return read_chat_csv(f)
+    encoding, header_row_idx = sniff_csv(source)
+    try:
+        chunks = _read_chunks(source, encoding, header_row_idx)
+    except UnicodeDecodeError:
+        # 앞부분은 ASCII뿐이고 뒤쪽에서 cp949 문자가 나오는 경우
+        source.seek(0)
+        chunks = _read_chunks(source, 'cp949', header_row_idx)
+
+    if chunks is None: return None
+    if not chunks: return compact_chat_frame(pd.DataFrame(columns=CHAT_COLUMNS))
+    return compact_chat_frame(pd.concat(chunks, ignore_index=True))
+
+# -----------------------------------------------------------------------------
+# 4. 컴팩트한 메모리 표현
+# -----------------------------------------------------------------------------
+def compact_chat_frame(df):
+    """시간순으로 정렬하고 User는 category, Message는 Arrow 문자열로 바꿔 메모리를 줄이는 함수
+
+    Date는 datetime64[ns](내부적으로 int64)로 유지해서 연도/기간 선택을 searchsorted 슬라이스로 처리합니다.
+    """
+    dates = df['Date'].to_numpy(dtype='datetime64[ns]')
+    order = np.argsort(dates, kind='stable')
+    return pd.DataFrame({
+        'Date': dates[order],
+        'User': pd.Categorical(df['User'].to_numpy(dtype=object)[order]),
+        'Message': pd.array(df['Message'].to_numpy(dtype=object)[order], dtype='string[pyarrow]'),
+    })
+
+def append_chat_frame(df, new):
+    """시간순 컴팩트 DataFrame 뒤에 새 메시지(역시 시간순)를 붙여서 (합친 DataFrame, 행 재배치 순서)를 반환
+
+    새 메시지가 모두 기존 마지막 메시지 이후면 정렬 없이 이어 붙이고 순서는 None을 돌려줍니다.
+    중간에 끼어드는 메시지가 있으면 합친 뒤 안정 정렬하고, 그 순서(합친 행 위치 배열)를 함께 돌려줍니다.
+    """
+    users = [c if isinstance(c.dtype, pd.CategoricalDtype) else c.astype('category') for c in (df['User'], new['User'])]
+    combined = pd.DataFrame({
+        'Date': np.concatenate([df['Date'].to_numpy(), new['Date'].to_numpy()]),
+        'User': union_categoricals(users),
+        'Message': pd.concat([df['Message'], new['Message']], ignore_index=True).astype('string[pyarrow]').array,
+    })
+    if df.empty or new.empty or new['Date'].iloc[0] >= df['Date'].iloc[-1]: return combined, None
+    order = np.argsort(combined['Date'].to_numpy(), kind='stable')
+    return combined.take(order).reset_index(drop=True), order
+
+def year_slices(df):
+    """연도별 행 범위 {연도: slice} (df.iloc[slice]는 복사 없이 뷰로 선택됨)"""
+    dates = df['Date'].to_numpy()
+    if len(dates) == 0: return {}
+    years = range(pd.Timestamp(dates[0]).year, pd.Timestamp(dates[-1]).year + 2)
+    bounds = np.searchsorted(dates, np.array([f"{y}-01-01" for y in years], dtype='datetime64[ns]'))
+    return {y: slice(int(a), int(b)) for y, a, b in zip(years, bounds[:-1], bounds[1:]) if b > a}
+
+# -----------------------------------------------------------------------------
+# 5. 내용 해시 기반 디스크 캐시
+# -----------------------------------------------------------------------------
+def source_digest(source):
+    """업로드 파일/바이트/경로의 내용 해시를 계산하는 함수"""
+    if isinstance(source, (bytes, bytearray)):
+        return kakao_cache.content_digest(source)
+    if hasattr(source, 'getbuffer'):
+        with source.getbuffer() as buf:
+            return kakao_cache.content_digest(buf)
+    h = hashlib.blake2b(digest_size=20)
+    with open(source, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def load_chat_file(source, use_cache=None):
+    """같은 내용의 파일은 디스크 캐시(Arrow)에서 바로 읽고, 처음 보는 파일만 CSV 파싱"""
+    if use_cache is None: use_cache = kakao_cache.CACHE_ENABLED
+    if not use_cache: return read_chat_csv(source)
+
+    key = f"v{CACHE_VERSION}-{source_digest(source)}"
+    df = kakao_cache.load_frame(key)
+    if df is not None: return df
+
+    df = read_chat_csv(source)
+    if df is not None:
+        try:
+            kakao_cache.store_frame(key, df)
+        except OSError:
+            pass  # 캐시 폴더에 쓸 수 없어도 분석은 계속 진행
+    return df
+
+# -----------------------------------------------------------------------------
+# 6. 집계 큐브 (연도 x 사용자 x 날짜 x 시간)
+# -----------------------------------------------------------------------------
+def build_count_cube(df):
+    """(Year, User, Day, Hour)별 메시지 수를 한 번의 groupby로 미리 집계하는 함수"""
+    keys = pd.DataFrame({
+        'Year': df['Date'].dt.year.astype('int16'),
+        'User': df['User'].astype('category'),
+        'Day': df['Date'].dt.normalize(),
+        'Hour': df['Date'].dt.hour.astype('int8'),
+    })
+    # User가 비어 있는 메시지도 총 대화 수에는 포함되도록 dropna=False
+    cube = keys.groupby(['Year', 'User', 'Day', 'Hour'], observed=True, sort=True, dropna=False).size()
+    return cube.rename('Count').reset_index()
+
+def merge_count_cubes(cube, other):
+    """두 큐브(예: 기존 데이터와 새로 추가된 메시지)를 합쳐 같은 칸의 메시지 수를 더하는 함수"""
+    merged = pd.concat([cube, other], ignore_index=True)
+    merged['User'] = merged['User'].astype('category')
+    merged = merged.groupby(['Year', 'User', 'Day', 'Hour'], observed=True, sort=True, dropna=False)['Count'].sum()
+    return merged.reset_index()
+
+def user_counts(cube, year=None):
+    """사용자별 메시지 수 (많은 순)"""
+    if year is not None: cube = cube[cube['Year'] == year]
+    counts = cube.groupby('User', observed=True)['Count'].sum()
+    return counts[counts > 0].sort_values(ascending=False, kind='stable')
+
+def yearly_counts(cube):
+    """연도별 메시지 수"""
+    return cube.groupby('Year')['Count'].sum()
+
+def get_time_of_day_label(hour):
+    if 5 <= hour < 12: return "🌞 아침형 인간"
+    elif 12 <= hour < 18: return "☕ 오후의 수다쟁이"
+    elif 18 <= hour < 24: return "🌙 저녁형 인간"
+    else: return "🦉 올빼미족"
+
+def wrapped_stats(cube, year):
+    """Wrapped 카드에 들어가는 통계(총 대화, MVP, 최고의 날, 황금 시간대)를 큐브에서 계산"""
+    c = cube[cube['Year'] == year]
+    total_msgs = int(c['Count'].sum())
+    stats = {'total_msgs': total_msgs, 'best_day': None, 'best_day_count': 0,
+             'best_hour': None, 'mvp_user': None, 'mvp_ratio': 0}
+    if total_msgs == 0: return stats
+
+    daily_counts = c.groupby('Day')['Count'].sum()
+    stats['best_day'] = daily_counts.idxmax()
+    stats['best_day_count'] = int(daily_counts.max())
+
+    hourly_counts = c.groupby('Hour')['Count'].sum()
+    stats['best_hour'] = int(hourly_counts.idxmax())
+
+    counts = user_counts(c)
+    if not counts.empty:
+        stats['mvp_user'] = counts.index[0]
+        stats['mvp_ratio'] = int((counts.iloc[0] / total_msgs) * 100)
+    return stats
+
+# -----------------------------------------------------------------------------
+# 7. 메시지 지문 (겹치는 내보내기 중복 제거)
+# -----------------------------------------------------------------------------
+def message_keys(df):
+    """(시각, 보낸 사람, 메시지 해시, 같은 내용 중 몇 번째인지)로 행마다 uint64 지문을 만드는 함수
+
+    같은 대화방을 기간이 겹치게 여러 번 내보낸 파일에서 같은 메시지는 같은 지문이 됩니다.
+    한 파일 안에서 같은 시각에 같은 말을 여러 번 보낸 경우("ㅋㅋ" 연속 등)는 순번으로 구분되어 그대로 남습니다.
+    """
+    base = pd.util.hash_pandas_object(df[CHAT_COLUMNS], index=False).to_numpy()
+    occurrence = pd.Series(base).groupby(base, sort=False).cumcount().to_numpy(dtype=np.uint64)
+    return pd.util.hash_pandas_object(pd.DataFrame({'key': base, 'n': occurrence}), index=False).to_numpy()
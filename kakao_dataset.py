@@ -0,0 +1,81 @@
+import numpy as np
+
+from kakao_core import append_chat_frame, build_count_cube, merge_count_cubes, message_keys
+from kakao_nlp import build_noun_index
+from kakao_search import build_search_index
+
+# -----------------------------------------------------------------------------
+# 1. 증분 적재 데이터셋
+# -----------------------------------------------------------------------------
+class ChatDataset:
+    """여러 내보내기 파일을 중복 없이 합친 대화와 그 파생 결과(집계 큐브, 명사 인덱스, 검색 색인)
+
+    - df: 시간순 컴팩트 DataFrame (Date/User/Message)
+    - sources: 이미 반영한 파일 내용 해시 (같은 파일은 다시 읽지 않음)
+    - duplicates: 이전 파일과 겹쳐서 건너뛴 메시지 수
+    파일을 추가하면 처음 보는 메시지만 붙이고, 이미 만든 큐브/명사 인덱스도 새 메시지만큼만 갱신합니다.
+    검색 색인은 행 위치 기반이라 데이터가 바뀌면 버리고 필요할 때 다시 만듭니다.
+    """
+
+    def __init__(self):
+        self.df = None
+        self.sources = []
+        self.duplicates = 0
+        self._keys = np.empty(0, dtype=np.uint64)   # 정렬된 메시지 지문 (searchsorted로 중복 판정)
+        self._key_sum = 0
+        self._count_cube = None
+        self._noun_index = None
+        self._search_index = None
+
+    def __len__(self):
+        return 0 if self.df is None else len(self.df)
+
+    @property
+    def key(self):
+        """내용 기반 데이터셋 키 (파일 구성이 달라도 합친 메시지가 같으면 같은 키)"""
+        return f"{len(self)}-{self._key_sum:016x}"
+
+    def add(self, frame, source=None):
+        """새 파일의 메시지 중 처음 보는 것만 추가하고 추가된 행 수를 반환"""
+        if source is not None: self.sources.append(source)
+        if frame is None or frame.empty: return 0
+
+        keys = message_keys(frame)
+        pos = np.minimum(np.searchsorted(self._keys, keys), max(len(self._keys) - 1, 0))
+        is_new = self._keys[pos] != keys if len(self._keys) else np.ones(len(keys), dtype=bool)
+        self.duplicates += int((~is_new).sum())
+        if not is_new.any(): return 0
+        if not is_new.all():
+            frame, keys = frame[is_new].reset_index(drop=True), keys[is_new]
+
+        new_keys = np.sort(keys)
+        self._keys = np.insert(self._keys, np.searchsorted(self._keys, new_keys), new_keys)
+        self._key_sum = (self._key_sum + int(new_keys.sum(dtype=np.uint64))) % 2 ** 64
+
+        if self.df is None:
+            self.df = frame
+            return len(frame)
+
+        self.df, order = append_chat_frame(self.df, frame)
+        # 파생 결과는 이미 만든 것만 새 메시지분으로 갱신
+        if self._count_cube is not None:
+            self._count_cube = merge_count_cubes(self._count_cube, build_count_cube(frame))
+        if self._noun_index is not None:
+            self._noun_index = self._noun_index.extend(frame['Message'], order)
+        self._search_index = None
+        return len(frame)
+
+    # -------------------------------------------------------------------------
+    # 파생 결과 (처음 필요할 때 전체로 한 번 만들고 이후에는 증분 갱신)
+    # -------------------------------------------------------------------------
+    def count_cube(self):
+        if self._count_cube is None: self._count_cube = build_count_cube(self.df)
+        return self._count_cube
+
+    def noun_index(self):
+        if self._noun_index is None: self._noun_index = build_noun_index(self.df['Message'])
+        return self._noun_index
+
+    def search_index(self):
+        if self._search_index is None: self._search_index = build_search_index(self.df)
+        return self._search_index
@@ -0,0 +1,137 @@
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+import kakao_cache
+import kakao_profile
+
+# -----------------------------------------------------------------------------
+# 1. Gemini 호출 설정
+# -----------------------------------------------------------------------------
+MODEL_NAME = 'gemini-2.5-flash'
+LLM_MAX_CONCURRENCY = int(os.environ.get('KAKAO_LLM_CONCURRENCY', 4))
+LLM_MAX_RETRIES = 4              # 요청 한도 초과/일시 장애 시 재시도 횟수
+LLM_BACKOFF_SECONDS = 2.0        # 첫 재시도 대기 시간 (이후 2배씩 증가)
+JSON_MAX_ATTEMPTS = 2            # JSON 파싱 실패 시 다시 요청하는 횟수
+SAMPLE_SEED = 0                  # 프롬프트에 넣을 메시지 샘플링 시드 (같은 데이터면 같은 샘플)
+
+RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.InternalServerError,
+)
+
+# -----------------------------------------------------------------------------
+# 2. 단일 호출 (재시도 포함)
+# -----------------------------------------------------------------------------
+def get_model(api_key, model_name=MODEL_NAME):
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(model_name)
+
+def generate_text(model, prompt, max_retries=LLM_MAX_RETRIES):
+    """요청 한도 초과 등 일시적인 오류는 지수 백오프로 재시도하면서 응답 텍스트를 받는 함수"""
+    with kakao_profile.stage('generate_content', memory=False, model=model.model_name, prompt_chars=len(prompt)) as record:
+        for attempt in range(max_retries + 1):
+            try:
+                text = model.generate_content(prompt).text
+                record.update(attempts=attempt + 1, response_chars=len(text))
+                return text
+            except RETRYABLE_ERRORS:
+                if attempt == max_retries: raise
+                time.sleep(LLM_BACKOFF_SECONDS * (2 ** attempt) * random.uniform(0.8, 1.2))
+
+def stream_text(model, prompt, max_retries=LLM_MAX_RETRIES):
+    """응답을 받는 대로 텍스트 조각을 내보내는 제너레이터 (첫 조각까지 걸린 시간과 전체 시간을 기록)
+
+    첫 조각을 받기 전의 일시적인 오류만 재시도합니다. 소비하는 쪽이 도중에 멈추면(보기 전환으로 rerun 등)
+    남은 응답은 더 받지 않고 기록에 cancelled를 남깁니다.
+    """
+    with kakao_profile.stage('generate_content_stream', memory=False, model=model.model_name,
+                             prompt_chars=len(prompt)) as record:
+        start = time.perf_counter()
+        for attempt in range(max_retries + 1):
+            try:
+                chunks = iter(model.generate_content(prompt, stream=True))
+                first = next(chunks, None)
+                break
+            except RETRYABLE_ERRORS:
+                if attempt == max_retries: raise
+                time.sleep(LLM_BACKOFF_SECONDS * (2 ** attempt) * random.uniform(0.8, 1.2))
+        record.update(attempts=attempt + 1, first_token_seconds=round(time.perf_counter() - start, 4))
+
+        received = 0
+        try:
+            for chunk in itertools.chain([first] if first is not None else [], chunks):
+                try:
+                    text = chunk.text
+                except ValueError:
+                    continue  # 텍스트가 없는 조각(안전 필터 정보 등)
+                received += len(text)
+                yield text
+        except GeneratorExit:
+            record['cancelled'] = True
+            return
+        finally:
+            record['response_chars'] = received
+
+def parse_json_response(text):
+    """```json 코드 블록으로 감싼 응답도 JSON으로 파싱"""
+    return json.loads(text.replace("```json", "").replace("```", "").strip())
+
+def generate_json(model, prompt, attempts=JSON_MAX_ATTEMPTS):
+    """JSON 응답을 받는 함수 (형식이 깨져 있으면 다시 요청)"""
+    for attempt in range(attempts):
+        try:
+            return parse_json_response(generate_text(model, prompt))
+        except json.JSONDecodeError:
+            if attempt == attempts - 1: raise
+
+def cached_generate(key_parts, fn, refresh=False):
+    """같은 키의 응답이 캐시에 있으면 API를 부르지 않고 반환 (refresh=True면 캐시를 무시하고 새로 저장)"""
+    key = kakao_cache.make_key(*key_parts)
+    if not refresh:
+        cached = kakao_cache.get_response(key)
+        if cached is not None: return cached
+    value = fn()
+    kakao_cache.put_response(key, value)
+    return value
+
+def cached_stream(key_parts, stream_fn, refresh=False):
+    """cached_generate의 스트리밍 버전: 캐시에 있으면 한 번에 내보내고, 없으면 받는 대로 내보낸 뒤 끝까지 받은 응답만 저장"""
+    key = kakao_cache.make_key(*key_parts)
+    if not refresh:
+        cached = kakao_cache.get_response(key)
+        if cached is not None:
+            yield cached
+            return
+    parts = []
+    for text in stream_fn():
+        parts.append(text)
+        yield text
+    kakao_cache.put_response(key, "".join(parts))
+
+# -----------------------------------------------------------------------------
+# 3. 동시 호출
+# -----------------------------------------------------------------------------
+def run_concurrent(fn, items, max_workers=LLM_MAX_CONCURRENCY):
+    """items 각각에 fn을 스레드 풀에서 실행하고, 끝나는 순서대로 (item, 결과, 오류)를 돌려주는 제너레이터
+
+    소비하는 쪽이 도중에 멈추면(보기 전환으로 rerun 등) 아직 시작하지 않은 요청은 취소하고 기다리지 않습니다.
+    """
+    fn = kakao_profile.bind(fn)   # 작업 스레드의 계측도 호출한 세션에 기록
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    try:
+        futures = {executor.submit(fn, item): item for item in items}
+        for future in as_completed(futures):
+            error = future.exception()
+            yield futures[future], (None if error else future.result()), error
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,311 @@
+import atexit
+import functools
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+# -----------------------------------------------------------------------------
+# 1. 형태소 분석 설정
+# -----------------------------------------------------------------------------
+# 명사 추출기: 'fast'(기본, 순수 파이썬 근사) 또는 'okt'(KoNLPy, JVM 필요). Okt와의 일치율은 bench_kakao.py --chat으로 확인
+TOKENIZER = os.environ.get('KAKAO_TOKENIZER', 'fast').lower()
+# Okt 워커는 각자 JVM을 띄우므로(수백 MB) 코어가 많아도 기본은 4개까지만
+NOUN_WORKERS = int(os.environ.get('KAKAO_NOUN_WORKERS', min(4, os.cpu_count() or 1)))
+NOUN_BATCH_SIZE = 2000           # 워커 한 번에 넘기는 메시지 수
+PARALLEL_MIN_MESSAGES = 5000     # 이보다 적으면 프로세스 풀 없이 바로 처리
+POOL_IDLE_SECONDS = 60           # 마지막 사용 후 이 시간 동안 쓰지 않으면 워커(와 JVM)를 정리
+# 키워드를 셀 때 선택한 기간에서 사용할 최대 메시지 수 (None이면 전체 사용, 넘으면 고르게 떨어진 메시지만 사용)
+NOUN_SAMPLE_LIMIT = int(os.environ['KAKAO_NOUN_SAMPLE_LIMIT']) if os.environ.get('KAKAO_NOUN_SAMPLE_LIMIT') else None
+
+_tokenizers = {}
+_tokenizer_lock = threading.Lock()
+_pool = None
+_pool_key = None
+_pool_users = 0                  # 풀을 쓰고 있는 호출 수 (쓰는 중에는 닫지 않음)
+_pool_timer = None
+_pool_lock = threading.Lock()
+
+# -----------------------------------------------------------------------------
+# 2. 명사 추출기
+# -----------------------------------------------------------------------------
+# 단어 끝에서 떼어낼 조사와 서술격 조사('친구인데', '언제야') (긴 것부터 맞춰봄)
+PARTICLES = ('에서부터', '으로부터', '에게서', '한테서', '이라고', '이랑은', '에서는', '에서도', '으로는', '에게는',
+             '한테는', '까지는', '부터는', '이라도', '께서는', '께서도', '에게도', '한테도', '에서', '에게', '한테',
+             '으로', '까지', '부터', '처럼', '보다', '이랑', '하고', '이나', '이나마', '이라', '라고', '마다', '밖에',
+             '조차', '이에요', '이니까', '인데', '이야', '이지', '이고', '이면', '께서', '에는', '에도', '은', '는', '이',
+             '가', '을', '를', '에', '엔', '께', '로', '와', '과', '도', '만', '의', '랑', '야')
+_PARTICLE_ALT = '|'.join(sorted(PARTICLES, key=len, reverse=True))
+# 받침 있는 말 뒤에만 붙는 조사와 받침 없는 말 뒤에만 붙는 조사 ('전문가', '통로'는 조사를 떼지 않음)
+_AFTER_FINAL = frozenset({'은', '이', '을', '과', '으로', '으로는', '으로부터', '이랑', '이랑은', '이나', '이나마', '이라',
+                          '이라고', '이라도', '이야', '이에요', '이니까', '이지', '이고', '이면'})
+_AFTER_VOWEL = frozenset({'는', '가', '를', '와', '로', '랑', '야'})
+# 한 글자 명사 뒤의 조사 ('책이', '비가', '앞에서') - 떼고 나면 한 글자라 버림. '정도', '사과'처럼 두 번째 글자가
+# 조사와 같은 두 글자 명사가 많아서 한 글자 조사는 받침에 맞는 것과 '에', '엔'만 인정
+_SHORT_STEM_PARTICLES = frozenset(p for p in PARTICLES if len(p) > 1) | _AFTER_FINAL | _AFTER_VOWEL | {'에', '엔'}
+# '공부했어' -> '공부' 처럼 명사 + 하다/되다 활용
+_PREDICATE_STEM_RE = re.compile(r'^([가-힣]{2,}?)(?:하|해|했|한|할|합|함|되|돼|됐|된|될|시켜|시키)[가-힣]{0,3}$')
+_PARTICLE_RE = re.compile(r'^([가-힣]+?)(%s)$' % _PARTICLE_ALT)
+# 이 어미로 끝나는 단어는 동사/형용사로 보고 제외
+PREDICATE_ENDINGS = ('습니다', '니다', '어요', '아요', '에요', '예요', '세요', '네요', '래요', '는데', '은데', '인데',
+                     '지만', '잖아', '거든', '구나', '군요', '을까', '을게', '겠다', '겠어', '었어', '았어', '였어',
+                     '었다', '았다', '자고', '다고', '냐고', '려고', '으면', '니까', '는지', '는게', '어서', '아서', '면서',
+                     '나면', '다면', '려면', '가고', '오고', '으러', '놀러', '더라', '야지', '해야', '고파', '아파', '먹자',
+                     '놀자', '르자', '키자', '짜자', '가서', '와서', '봐서', '줘서', '써서', '져서', '쪄서', '겨서', '셔서',
+                     '려서', '돼서', '쳐서', '온대', '준대', '간대', '는대', '한대', '가자', '보자', '하자', '겨', '셔', '쳐', '져',
+                     '려', '줘', '봐', '놔')
+# 한 글자 어미: 세 글자 이상이거나 앞 글자에 받침이 있을 때만 ('쏜다', '갈래'는 어미, '바다', '노래'는 명사)
+_ONE_SYLLABLE_ENDINGS = frozenset('다요죠까냐네래워줄할히')
+# 받침 뒤에 붙는 짧은 어미 ('믿어', '괜찮아', '먹고', '쓸게', '귀엽지', '있는') - '단어', '광고', '편지'처럼
+# ㄴ/ㅁ/ㅇ 받침 명사가 많아서 그 받침은 제외
+_SHORT_ENDINGS = frozenset('어아고게지는')
+_NOUN_FINALS = frozenset({0, 4, 16, 21})   # 받침 없음, ㄴ, ㅁ, ㅇ
+# 조사가 붙은 대명사 ('나는', '제가', '그게', '뭐야') - 한 글자 어간이라 조사 표로는 떼어지지 않음
+PRONOUNS = ('나', '너', '저', '제', '내', '네', '니', '난', '넌', '전', '그', '이', '뭐', '누', '얘', '걔', '쟤', '거',
+            '우리', '저희', '너희', '이거', '그거', '저거', '이것', '그것', '저것', '여기', '거기', '저기', '누구')
+_PRONOUN_RE = re.compile(r'^(?:%s)(?:%s|게|건|걸)?$' % ('|'.join(PRONOUNS), _PARTICLE_ALT))
+# 조사/어미처럼 끝나지만 그대로 명사인 단어 ('고양이' -> '고양', '제주도' -> '제주'가 되지 않게)
+KEEP_NOUNS = frozenset({
+    '고양이', '원숭이', '어린이', '놀이', '휴가', '요가', '역할', '배려', '고려', '염려', '제주도', '경기도', '강원도', '울릉도', '거제도',
+    '전라도', '경상도', '충청도',
+})
+# 조사/어미를 떼면 명사처럼 보이지만 실제로는 부사/감탄사/용언인 대화체 표현
+STOPWORDS = frozenset({
+    '그래', '그냥', '근데', '그럼', '그리고', '그래서', '그런데', '그러면', '정말', '너무', '아니', '아니야', '이제',
+    '혹시', '많이', '빨리', '다시', '같이', '먼저', '아직', '별로', '가장', '조금', '아까', '어떻게', '좋아', '몰라',
+    '고마워', '잘자', '뭐해', '알았어', '하기', '하고', '있어', '없어', '했어', '먹자', '가자', '보자', '하자',
+    '뭔가', '무슨', '어디', '언제', '이렇게', '그렇게', '엄청', '어때', '함께', '새로', '어디서', '어느',
+})
+_HANGUL_WORD_RE = re.compile(r'[가-힣]+')
+
+class FastNounTokenizer:
+    """정규식과 조사/어미 표로 명사를 근사하는 순수 파이썬 추출기
+
+    JVM을 띄우지 않아 시작 비용이 없고, 같은 단어는 한 번만 분석합니다.
+    복합명사를 나누지 않는 등('배달비', '카드값') Okt와 다르게 나오는 경우가 있어서, 더 정확한 분석이 필요하면
+    KAKAO_TOKENIZER=okt를 사용하세요.
+    """
+    name = 'fast'
+    parallel = False    # 프로세스 간 문자열 전달 비용이 분석 비용보다 커서 현재 프로세스에서 처리
+
+    def nouns(self, text):
+        return [noun for noun in map(self._noun_of, _HANGUL_WORD_RE.findall(text)) if noun]
+
+    @staticmethod
+    @functools.lru_cache(maxsize=200_000)
+    def _noun_of(word):
+        if len(word) < 2 or word in STOPWORDS or _PRONOUN_RE.match(word): return None
+        if word in KEEP_NOUNS: return word
+        m = _PARTICLE_RE.match(word)
+        if m and _particle_fits(*m.groups()):
+            if len(m.group(1)) == 1: return None   # 한 글자 명사
+            word = m.group(1)
+            if word in KEEP_NOUNS: return word
+            m = _PARTICLE_RE.match(word)   # '언제부터야' -> '언제부터' -> '언제'
+            if m and len(m.group(2)) > 1 and _particle_fits(*m.groups()): word = m.group(1)
+            m = _PREDICATE_STEM_RE.match(word)   # '예약해야' -> '예약해' -> '예약'
+            if m: word = m.group(1)
+        else:
+            m = _PREDICATE_STEM_RE.match(word)
+            if m: word = m.group(1)
+            elif word.endswith(PREDICATE_ENDINGS): return None
+        if _has_short_ending(word) or word in STOPWORDS: return None
+        return word
+
+def _final(syllable):
+    """한글 음절의 받침 번호 (0이면 받침 없음)"""
+    return (ord(syllable) - 0xAC00) % 28
+
+def _particle_fits(stem, particle):
+    """조사가 앞 글자의 받침 유무에 맞는지 (한 글자 어간은 _SHORT_STEM_PARTICLES만)"""
+    if len(stem) == 1 and particle not in _SHORT_STEM_PARTICLES: return False
+    final = _final(stem[-1])
+    if particle in _AFTER_FINAL: return final != 0
+    if particle in _AFTER_VOWEL: return final == 0 or (particle == '로' and final == 8)   # '길로'
+    return True
+
+def _has_short_ending(word):
+    """'믿어', '쏜다', '바꾸고', '보러', '재밌대'처럼 짧은 어미로 끝나는 용언인지"""
+    if len(word) < 2: return False
+    last, final = word[-1], _final(word[-2])
+    if last in _ONE_SYLLABLE_ENDINGS: return len(word) > 2 or final != 0
+    if last in _SHORT_ENDINGS:
+        return final not in _NOUN_FINALS or (final == 0 and len(word) > 2 and last in '고게')
+    if last == '러': return final == 0
+    if last == '대': return final in (9, 20, 27)   # ㄺ/ㅆ/ㅎ 받침 ('맑대', '했대', '좋대')
+    return False
+
+class OktTokenizer:
+    """KoNLPy Okt 형태소 분석기 (정확하지만 처음 만들 때 JVM을 띄움)"""
+    name = 'okt'
+    parallel = True
+
+    def __init__(self):
+        from konlpy.tag import Okt
+        self._okt = Okt()
+
+    def nouns(self, text):
+        return self._okt.nouns(text)
+
+TOKENIZERS = {'fast': FastNounTokenizer, 'okt': OktTokenizer}
+
+def _backend(backend=None):
+    backend = (backend or TOKENIZER).lower()
+    if backend not in TOKENIZERS:
+        raise ValueError(f"알 수 없는 명사 추출기: {backend} (사용 가능: {', '.join(TOKENIZERS)})")
+    return backend
+
+def get_tokenizer(backend=None):
+    """현재 프로세스의 명사 추출기 인스턴스 (Okt는 처음 호출할 때 JVM을 띄움)"""
+    backend = _backend(backend)
+    if backend not in _tokenizers:
+        with _tokenizer_lock:   # 여러 세션이 동시에 Okt를 만들면 JVM을 두 번 띄우려다 실패함
+            if backend not in _tokenizers: _tokenizers[backend] = TOKENIZERS[backend]()
+    return _tokenizers[backend]
+
+# -----------------------------------------------------------------------------
+# 3. 워커
+# -----------------------------------------------------------------------------
+def _init_worker(backend):
+    """워커 프로세스 시작 시 추출기를 미리 띄워서 첫 배치가 느려지지 않게 함"""
+    get_tokenizer(backend).nouns("워밍업")
+
+def extract_nouns_batch(texts, backend=None):
+    """메시지 묶음을 메시지별 명사 리스트(2글자 이상)로 바꾸는 함수"""
+    tokenizer = get_tokenizer(backend)
+    return [[n for n in tokenizer.nouns(text) if len(n) > 1] if isinstance(text, str) else [] for text in texts]
+
+@contextmanager
+def _use_pool(workers, backend):
+    """워커 풀을 빌려 쓰는 컨텍스트 (여러 세션이 동시에 불러도 풀은 하나, 다 쓰면 유휴 타이머로 정리)"""
+    global _pool, _pool_key, _pool_users, _pool_timer
+    with _pool_lock:
+        if _pool_timer is not None:
+            _pool_timer.cancel()
+            _pool_timer = None
+        if _pool is None or (_pool_key != (workers, backend) and _pool_users == 0):
+            _shutdown_locked()
+            # 부모 프로세스에 이미 JVM이 떠 있을 수 있으므로 fork 대신 spawn 사용
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                        initializer=_init_worker, initargs=(backend,))
+            _pool_key = (workers, backend)
+        pool = _pool
+        _pool_users += 1
+    try:
+        yield pool
+    finally:
+        with _pool_lock:
+            _pool_users -= 1
+            if _pool_users == 0 and _pool is not None:
+                _pool_timer = threading.Timer(POOL_IDLE_SECONDS, _shutdown_idle_pool)
+                _pool_timer.daemon = True
+                _pool_timer.start()
+
+def _shutdown_locked():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def _shutdown_idle_pool():
+    with _pool_lock:
+        if _pool_users == 0: _shutdown_locked()   # 타이머가 도는 사이 다시 빌려 간 경우는 그대로 둠
+
+@atexit.register
+def shutdown_pool():
+    with _pool_lock:
+        _shutdown_locked()
+
+def map_batches(fn, texts, workers=None, backend=None):
+    """메시지를 배치로 나눠 워커 풀에서 fn(batch, backend)을 실행하고 결과를 순서대로 돌려주는 함수"""
+    texts = list(texts)
+    backend = _backend(backend)
+    workers = NOUN_WORKERS if workers is None else workers
+    if workers <= 1 or len(texts) < PARALLEL_MIN_MESSAGES or not TOKENIZERS[backend].parallel:
+        return [fn(texts, backend)]
+
+    batches = [texts[i:i + NOUN_BATCH_SIZE] for i in range(0, len(texts), NOUN_BATCH_SIZE)]
+    try:
+        with _use_pool(workers, backend) as pool:
+            return list(pool.map(functools.partial(fn, backend=backend), batches))
+    except BrokenProcessPool:
+        # 워커가 죽은 경우(메모리 부족 등) 풀을 버리고 현재 프로세스에서 처리
+        shutdown_pool()
+        return [fn(texts, backend)]
+
+# -----------------------------------------------------------------------------
+# 4. 메시지별 명사 인덱스 (CSR)
+# -----------------------------------------------------------------------------
+class NounIndex:
+    """메시지마다 한 번만 형태소 분석한 결과를 담는 인덱스
+
+    - vocab: 명사 id -> 문자열
+    - token_ids / offsets: 고유 메시지 i의 명사 id는 token_ids[offsets[i]:offsets[i+1]]
+    - message_codes: 원본 행 -> 고유 메시지 번호 (결측 메시지는 -1)
+    같은 내용의 메시지("ㅋㅋ", "사진" 등)는 한 번만 분석하고 행 단위로 가중치를 줘서 셉니다.
+    """
+
+    def __init__(self, vocab, token_ids, offsets, message_codes):
+        self.vocab = vocab
+        self.token_ids = token_ids
+        self.offsets = offsets
+        self.message_codes = message_codes
+        self._token_owner = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+    def __len__(self):
+        return len(self.message_codes)
+
+    def noun_counts(self, rows=None, limit=NOUN_SAMPLE_LIMIT):
+        """선택한 행(위치 배열/불리언 마스크/슬라이스, None이면 전체)의 명사별 빈도 배열
+
+        limit보다 많은 행이 선택되면 기간 전체에 고르게 떨어진 limit개 행만 셉니다.
+        """
+        codes = self.message_codes if rows is None else self.message_codes[rows]
+        if limit is not None and len(codes) > limit:
+            codes = codes[np.linspace(0, len(codes) - 1, limit).astype(np.int64)]
+        codes = codes[codes >= 0]
+        message_weights = np.bincount(codes, minlength=len(self.offsets) - 1)
+        return np.bincount(self.token_ids, weights=message_weights[self._token_owner],
+                           minlength=len(self.vocab)).astype(np.int64)
+
+    def top_nouns(self, rows=None, top_n=50, limit=NOUN_SAMPLE_LIMIT):
+        """선택한 행에서 가장 많이 나온 명사 top_n개를 [(단어, 빈도)]로 반환"""
+        counts = self.noun_counts(rows, limit)
+        order = np.argsort(-counts, kind='stable')[:top_n]
+        return [(self.vocab[i], int(counts[i])) for i in order if counts[i] > 0]
+
+    def extend(self, messages, order=None, workers=None, backend=None):
+        """새로 추가된 메시지만 분석해서 뒤에 붙인 인덱스를 반환
+
+        order가 있으면(새 메시지가 중간에 끼어들어 다시 정렬한 경우) 합친 행을 그 순서로 재배치합니다.
+        """
+        other = build_noun_index(messages, workers, backend)
+        vocab_ids = {noun: i for i, noun in enumerate(self.vocab)}
+        remap = np.array([vocab_ids.setdefault(noun, len(vocab_ids)) for noun in other.vocab], dtype=np.int32)
+        n_unique = len(self.offsets) - 1
+        message_codes = np.concatenate([self.message_codes,
+                                        np.where(other.message_codes >= 0, other.message_codes + n_unique, -1)])
+        if order is not None: message_codes = message_codes[order]
+        return NounIndex(list(vocab_ids), np.concatenate([self.token_ids, remap[other.token_ids]]),
+                         np.concatenate([self.offsets, other.offsets[1:] + self.offsets[-1]]), message_codes)
+
+def build_noun_index(messages, workers=None, backend=None):
+    """메시지 목록을 고유 메시지 단위로 형태소 분석해서 NounIndex를 만드는 함수"""
+    messages = pd.Series(messages).reset_index(drop=True)
+    message_codes, uniques = pd.factorize(messages, use_na_sentinel=True)
+    noun_lists = [nouns for batch in map_batches(extract_nouns_batch, uniques, workers, backend) for nouns in batch]
+
+    vocab_ids = {}
+    token_ids = []
+    offsets = np.zeros(len(noun_lists) + 1, dtype=np.int64)
+    for i, nouns in enumerate(noun_lists):
+        token_ids.extend(vocab_ids.setdefault(n, len(vocab_ids)) for n in nouns)
+        offsets[i + 1] = len(token_ids)
+    return NounIndex(list(vocab_ids), np.asarray(token_ids, dtype=np.int32), offsets,
+                     message_codes.astype(np.int64))
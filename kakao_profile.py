@@ -0,0 +1,124 @@
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+# -----------------------------------------------------------------------------
+# 1. 계측 설정
+# -----------------------------------------------------------------------------
+ENABLED = os.environ.get('KAKAO_PROFILE', '0') == '1'   # 스코프가 없을 때(CLI 등)와 새 세션의 기본값
+# 1이면 memory=True인 단계의 최대 메모리도 잼 (tracemalloc은 프로세스 전체를 느리게 하므로 따로 켬)
+MEMORY = os.environ.get('KAKAO_PROFILE_MEMORY', '0') == '1'
+LOG_PATH = os.environ.get('KAKAO_PROFILE_LOG')   # 지정하면 기록을 JSON Lines로 계속 추가
+MAX_RECORDS = 2000
+
+_records = deque(maxlen=MAX_RECORDS)   # 스코프가 없는 실행(CLI, 벤치마크)의 기록
+_lock = threading.Lock()
+_scope = contextvars.ContextVar('kakao_profile_scope', default=None)
+_scope_provider = None
+
+# -----------------------------------------------------------------------------
+# 2. 스코프 (켜짐 여부와 기록 저장소를 세션마다 따로 둠)
+# -----------------------------------------------------------------------------
+def set_scope_provider(provider):
+    """현재 (켜짐 여부, 기록 deque)를 돌려주는 함수를 등록 (None을 돌려주면 전역 ENABLED/_records 사용)
+
+    Streamlit 앱에서는 세션 상태를 돌려주도록 등록해서, 한 사용자의 설정과 기록이 다른 세션에 섞이지 않게 합니다.
+    """
+    global _scope_provider
+    _scope_provider = provider
+
+def _current():
+    scope = _scope.get()
+    if scope is None and _scope_provider is not None: scope = _scope_provider()
+    return scope or (ENABLED, _records)
+
+def is_enabled():
+    return _current()[0]
+
+def bind(fn):
+    """현재 스코프를 다른 스레드(스레드 풀 등)에서도 쓰도록 fn을 감싸는 함수"""
+    scope = _current()
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = _scope.set(scope)
+        try: return fn(*args, **kwargs)
+        finally: _scope.reset(token)
+    return wrapper
+
+# -----------------------------------------------------------------------------
+# 3. 단계 기록
+# -----------------------------------------------------------------------------
+@contextmanager
+def stage(name, memory=False, **fields):
+    """with 블록의 실행 시간(과 memory=True면 최대 메모리)을 기록하는 컨텍스트 매니저
+
+    꺼져 있으면 아무것도 하지 않습니다. 블록 안에서 반환된 dict에 행 수, 프롬프트 크기 등을 추가할 수 있습니다.
+    메모리는 KAKAO_PROFILE_MEMORY=1일 때만, tracemalloc을 직접 시작한 가장 바깥 단계에서 잽니다. tracemalloc은
+    프로세스 전체(다른 세션 포함)를 느리게 하므로 무거운 단계(로드, 색인)에만 memory=True를 주세요.
+    """
+    enabled, sink = _current()
+    if not enabled:
+        yield {}
+        return
+
+    record = {'stage': name, 'thread': threading.current_thread().name, **fields}
+    owns_trace = memory and MEMORY and not tracemalloc.is_tracing()
+    if owns_trace: tracemalloc.start()
+    started_at = time.time()
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record['error'] = type(e).__name__
+        raise
+    finally:
+        record['seconds'] = round(time.perf_counter() - start, 4)
+        record['started_at'] = started_at
+        if owns_trace:
+            record['peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 1024 ** 2, 2)
+            tracemalloc.stop()
+        _add(record, sink)
+
+def profiled(name=None, memory=False):
+    """함수 전체를 stage로 감싸는 데코레이터"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not is_enabled(): return fn(*args, **kwargs)
+            with stage(name or fn.__name__, memory=memory):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def _add(record, sink):
+    with _lock:
+        sink.append(record)
+        if LOG_PATH:
+            try:
+                with open(LOG_PATH, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            except OSError:
+                pass
+
+# -----------------------------------------------------------------------------
+# 4. 조회 / 내보내기 (현재 스코프의 기록만)
+# -----------------------------------------------------------------------------
+def records():
+    sink = _current()[1]
+    with _lock:
+        return list(sink)
+
+def clear():
+    sink = _current()[1]
+    with _lock:
+        sink.clear()
+
+def export_jsonl():
+    """현재 스코프의 기록을 JSON Lines 문자열로 반환"""
+    return "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in records())
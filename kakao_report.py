@@ -0,0 +1,136 @@
+import math
+
+import numpy as np
+
+from kakao_llm import MODEL_NAME, cached_generate, cached_stream, generate_text, run_concurrent, stream_text
+from kakao_search import estimate_tokens
+
+# -----------------------------------------------------------------------------
+# 1. 리포트 설정
+# -----------------------------------------------------------------------------
+WINDOW_FREQ = 'W'                # 요약 단위 기간 (주)
+WINDOW_TOKEN_BUDGET = 6000       # 기간 요약 호출 한 번에 넣을 대화 분량
+REDUCE_TOKEN_BUDGET = 12000      # 요약들을 합치는 호출 한 번에 넣을 분량
+
+NO_CHAT_MESSAGE = "분석할 대화가 없습니다."
+PRIVACY_NOTE = "전화번호, 계좌번호, 아이디 및 비밀번호 등 민감한 개인정보는 제외해주세요."
+
+# -----------------------------------------------------------------------------
+# 2. 기간 나누기
+# -----------------------------------------------------------------------------
+def fit_lines(lines, token_budget):
+    """줄 목록이 예산을 넘으면 일정 간격으로 솎아내서 기간 전체를 고르게 담는 함수"""
+    total = sum(estimate_tokens(line) + 1 for line in lines)
+    if total <= token_budget: return lines
+    stride = math.ceil(total / token_budget)
+    return lines[::stride]
+
+def split_windows(df, freq=WINDOW_FREQ, token_budget=WINDOW_TOKEN_BUDGET):
+    """대화를 기간(기본: 주) 단위로 나눠 [(기간 이름, 대화 텍스트)]로 반환"""
+    df = df.dropna(subset=['Message']).sort_values('Date', kind='stable')
+    if df.empty: return []
+    lines = (df['Date'].dt.strftime('%m-%d %H:%M') + ' ' + df['User'].astype(object).fillna('알 수 없음').astype(str)
+             + ': ' + df['Message'].astype(str)).to_numpy()
+    periods = df['Date'].dt.to_period(freq)
+    codes, uniques = periods.factorize(sort=True)
+    bounds = np.searchsorted(codes, np.arange(len(uniques) + 1))
+
+    windows = []
+    for i, period in enumerate(uniques):
+        window_lines = fit_lines(list(lines[bounds[i]:bounds[i + 1]]), token_budget)
+        label = f"{period.start_time:%m/%d}~{period.end_time:%m/%d}"
+        windows.append((label, "\n".join(window_lines)))
+    return windows
+
+# -----------------------------------------------------------------------------
+# 3. 프롬프트
+# -----------------------------------------------------------------------------
+def window_prompt(label, text):
+    return f"""
+    다음은 카카오톡 대화방의 {label} 기간 대화입니다.
+    {text}
+
+    {PRIVACY_NOTE}
+    이 기간에 있었던 주요 화제, 사건, 대화 분위기를 3~5줄로 간결하게 요약해주세요.
+    """
+
+def merge_prompt(summaries):
+    return f"""
+    다음은 카카오톡 대화방의 기간별 요약입니다.
+    {summaries}
+
+    {PRIVACY_NOTE}
+    중요한 화제와 분위기 변화가 빠지지 않도록 하나의 요약(5~8줄)으로 합쳐주세요.
+    """
+
+def report_prompt(year, summaries):
+    return f"""
+    당신은 전문 데이터 분석가입니다. 다음은 {year}년도 카카오톡 대화방 전체를 기간별로 요약한 내용입니다.
+
+    기간별 요약:
+    {summaries}
+    {PRIVACY_NOTE}
+
+    위 내용을 바탕으로 다음 3가지를 분석해서 마크다운 형식으로 깔끔하게 보고서를 작성해주세요:
+
+    1. 🗣️ **전반적인 대화의 분위기**
+       - 대화가 주로 어떤 톤인지 (유머러스, 진지함, 정보공유, 잡담 등)
+
+    2. 🔥 **주요 관심사나 주제**
+       - 이들이 가장 많이 이야기한 토픽 3~4가지를 구체적으로 설명
+
+    3. 📝 **한 줄 총평**
+       - 이 해의 대화를 아우르는 멋진 한 줄 요약
+    """
+
+# -----------------------------------------------------------------------------
+# 4. Map-Reduce 요약
+# -----------------------------------------------------------------------------
+def _summarize_all(model, prompts, refresh, on_progress=None):
+    """프롬프트들을 동시에 요약하고 원래 순서대로 결과를 반환 (같은 프롬프트는 캐시 재사용)"""
+    def summarize(item):
+        i, prompt = item
+        return cached_generate(('report-window', MODEL_NAME, prompt), lambda: generate_text(model, prompt), refresh=refresh)
+
+    results = [None] * len(prompts)
+    for done, ((i, _), summary, error) in enumerate(run_concurrent(summarize, list(enumerate(prompts))), start=1):
+        if error: raise error
+        results[i] = summary
+        if on_progress: on_progress(done, len(prompts))
+    return results
+
+def _group_by_budget(texts, token_budget):
+    groups, current, used = [], [], 0
+    for text in texts:
+        cost = estimate_tokens(text) + 1
+        if current and used + cost > token_budget:
+            groups.append(current)
+            current, used = [], 0
+        current.append(text)
+        used += cost
+    if current: groups.append(current)
+    return groups
+
+def _final_prompt(model, df, year, refresh, on_progress):
+    """기간별 요약(map)과 합치기(reduce)를 거쳐 최종 리포트 프롬프트를 만드는 함수 (대화가 없으면 None)"""
+    windows = split_windows(df)
+    if not windows: return None
+
+    summaries = _summarize_all(model, [window_prompt(label, text) for label, text in windows], refresh, on_progress)
+    texts = [f"[{label}] {summary.strip()}" for (label, _), summary in zip(windows, summaries)]
+
+    # 요약이 한 번에 들어가지 않으면 예산 단위로 묶어서 다시 요약
+    while sum(estimate_tokens(t) + 1 for t in texts) > REDUCE_TOKEN_BUDGET and len(texts) > 1:
+        groups = _group_by_budget(texts, REDUCE_TOKEN_BUDGET)
+        if len(groups) == len(texts): break  # 요약 하나가 예산보다 크면 더 줄일 수 없음
+        texts = _summarize_all(model, [merge_prompt("\n".join(g)) for g in groups], refresh)
+
+    return report_prompt(year, "\n".join(texts))
+
+def stream_year_report(model, df, year, refresh=False, on_progress=None):
+    """한 해 대화를 주 단위로 요약(map)한 뒤 합쳐서(reduce) 만든 최종 리포트를 받는 대로 조각씩 내보내는 제너레이터"""
+    prompt = _final_prompt(model, df, year, refresh, on_progress)
+    if prompt is None:
+        yield NO_CHAT_MESSAGE
+        return
+    yield from cached_stream(('report', MODEL_NAME, prompt), lambda: stream_text(model, prompt), refresh=refresh)
@@ -0,0 +1,154 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# -----------------------------------------------------------------------------
+# 1. 검색 설정
+# -----------------------------------------------------------------------------
+BM25_K1 = 1.2
+BM25_B = 0.75
+TOP_K = 40                       # 질문마다 가져올 관련 메시지 수
+NEIGHBOR_WINDOW = 2              # 관련 메시지 앞뒤로 함께 넣을 메시지 수
+CONTEXT_TOKEN_BUDGET = 8000      # 프롬프트에 넣을 대화 분량 (한글은 보수적으로 글자 수 = 토큰 수로 계산)
+INDEX_BATCH_ROWS = 50_000        # 색인을 만들 때 한 번에 파이썬 문자열로 꺼내는 메시지 수
+
+_WORD_RE = re.compile(r'[0-9A-Za-z가-힣]+')
+
+# -----------------------------------------------------------------------------
+# 2. 토큰화 (문자 bigram)
+# -----------------------------------------------------------------------------
+def text_ngrams(text):
+    """단어를 문자 bigram으로 쪼개는 함수 (한 글자 단어는 그대로 사용)
+
+    '가자고' 같은 활용형도 '가자'로 매칭되도록 형태소 분석 대신 bigram을 씁니다.
+    """
+    grams = []
+    for word in _WORD_RE.findall(text.lower()):
+        if len(word) == 1: grams.append(word)
+        else: grams.extend(word[i:i + 2] for i in range(len(word) - 1))
+    return grams
+
+def estimate_tokens(text):
+    return len(text)
+
+# -----------------------------------------------------------------------------
+# 3. BM25 역색인
+# -----------------------------------------------------------------------------
+class SearchIndex:
+    """메시지 bigram 역색인 (CSR: 단어 t의 문서는 doc_ids[offsets[t]:offsets[t+1]])"""
+
+    def __init__(self, vocab, doc_ids, term_freqs, offsets, doc_len, dates, users, messages):
+        self.vocab = vocab
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+        self.offsets = offsets
+        self.doc_len = doc_len
+        self.dates = dates
+        self.users = users
+        self.messages = messages
+        # 시간순 정렬 (앞뒤 메시지를 찾을 때 사용)
+        self.time_order = np.argsort(dates, kind='stable')
+        self.time_rank = np.empty_like(self.time_order)
+        self.time_rank[self.time_order] = np.arange(len(self.time_order))
+
+        avg_len = doc_len.mean() if len(doc_len) and doc_len.mean() > 0 else 1.0
+        self._len_norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len / avg_len)
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    def scores(self, query, rows=None):
+        """질문에 대한 메시지별 BM25 점수 배열 (rows 밖의 메시지는 0)"""
+        n_docs = len(self)
+        scores = np.zeros(n_docs)
+        for gram in set(text_ngrams(query)):
+            term = self.vocab.get(gram)
+            if term is None: continue
+            start, end = self.offsets[term], self.offsets[term + 1]
+            docs, tf = self.doc_ids[start:end], self.term_freqs[start:end]
+            idf = np.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores += np.bincount(docs, weights=idf * tf * (BM25_K1 + 1) / (tf + self._len_norm[docs]),
+                                  minlength=n_docs)
+        if rows is not None:
+            allowed = np.zeros(n_docs, dtype=bool)
+            allowed[rows] = True
+            scores[~allowed] = 0
+        return scores
+
+    def search(self, query, rows=None, top_k=TOP_K):
+        """점수가 높은 순서로 메시지 위치 배열을 반환"""
+        scores = self.scores(query, rows)
+        hits = np.flatnonzero(scores > 0)
+        if len(hits) > top_k:
+            hits = hits[np.argpartition(-scores[hits], top_k - 1)[:top_k]]
+        return hits[np.argsort(-scores[hits], kind='stable')]
+
+    def format_line(self, pos):
+        date = self.dates[pos]
+        date_str = pd.Timestamp(date).strftime('%Y-%m-%d %H:%M') if not pd.isna(date) else '날짜 없음'
+        user = self.users[pos] if not pd.isna(self.users[pos]) else '알 수 없음'
+        message = self.messages[pos] if isinstance(self.messages[pos], str) else ''
+        return f"[{date_str}] {user}: {message}"
+
+def build_search_index(df):
+    """Date/User/Message DataFrame으로 BM25 역색인을 한 번 만드는 함수"""
+    # 메시지 배열(Arrow 문자열)은 그대로 참조하고, 파이썬 문자열은 구간별로만 꺼내서 처리
+    messages = df['Message'].array
+    n_docs = len(messages)
+    vocab = {}
+    term_ids = []
+    doc_len = np.zeros(n_docs, dtype=np.int32)
+    for start in range(0, n_docs, INDEX_BATCH_ROWS):
+        texts = messages[start:start + INDEX_BATCH_ROWS].to_numpy(dtype=object)
+        for doc, text in enumerate(texts, start=start):
+            if not isinstance(text, str): continue
+            grams = text_ngrams(text)
+            doc_len[doc] = len(grams)
+            term_ids.extend(vocab.setdefault(g, len(vocab)) for g in grams)
+
+    doc_of_term = np.repeat(np.arange(n_docs, dtype=np.int64), doc_len)
+    keys = np.asarray(term_ids, dtype=np.int64) * max(n_docs, 1) + doc_of_term
+    keys, term_freqs = np.unique(keys, return_counts=True)   # 단어 -> 문서 순으로 정렬됨
+    terms, doc_ids = np.divmod(keys, max(n_docs, 1))
+    offsets = np.searchsorted(terms, np.arange(len(vocab) + 1))
+    return SearchIndex(vocab, doc_ids, term_freqs.astype(np.float64), offsets, doc_len,
+                       df['Date'].to_numpy(), df['User'].array, messages)
+
+# -----------------------------------------------------------------------------
+# 4. 프롬프트 컨텍스트 구성
+# -----------------------------------------------------------------------------
+def build_context(index, query, rows=None, top_k=TOP_K, window=NEIGHBOR_WINDOW, token_budget=CONTEXT_TOKEN_BUDGET):
+    """관련 메시지와 앞뒤 대화를 토큰 예산 안에서 골라 시간순 컨텍스트 문자열로 만드는 함수"""
+    allowed = np.ones(len(index), dtype=bool) if rows is None else np.zeros(len(index), dtype=bool)
+    if rows is not None: allowed[rows] = True
+
+    hits = index.search(query, rows, top_k)
+    if len(hits) == 0:
+        # 관련 메시지가 없으면 기간 전체에서 고르게 뽑아서 전달
+        in_range = index.time_order[allowed[index.time_order]]
+        hits = in_range[np.linspace(0, len(in_range) - 1, min(top_k, len(in_range))).astype(int)] if len(in_range) else hits
+        window = 0
+
+    selected = {}
+    used = 0
+    for hit in hits:
+        rank = index.time_rank[hit]
+        block = index.time_order[max(rank - window, 0):rank + window + 1]
+        for pos in block[allowed[block]]:
+            if pos in selected: continue
+            line = index.format_line(pos)
+            cost = estimate_tokens(line) + 1
+            if used + cost > token_budget: break
+            selected[pos] = line
+            used += cost
+        if used >= token_budget: break
+
+    lines = []
+    prev_rank = None
+    for pos in sorted(selected, key=lambda p: index.time_rank[p]):
+        rank = index.time_rank[pos]
+        if prev_rank is not None and rank != prev_rank + 1: lines.append("...")
+        lines.append(selected[pos])
+        prev_rank = rank
+    return "\n".join(lines)
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+# -----------------------------------------------------------------------------
+# 1. 대화 흐름 분석 설정
+# -----------------------------------------------------------------------------
+SESSION_GAP_MINUTES = 60         # 이 시간 이상 아무도 말하지 않으면 새 대화로 봄
+MIN_REPLIES = 10                 # 답장 속도 순위에 넣을 최소 답장 수
+DAY_NS = 86_400 * 10 ** 9
+
+# -----------------------------------------------------------------------------
+# 2. 세션 / 답장 속도 / 연속 기록 (행 단위 파이썬 반복 없이 배열 연산으로 계산)
+# -----------------------------------------------------------------------------
+def _user_codes(users):
+    """User 열을 (정수 코드 배열, 이름 배열)로 변환 (결측은 -1)"""
+    if isinstance(users.dtype, pd.CategoricalDtype):
+        return users.cat.codes.to_numpy(dtype=np.int64), users.cat.categories.to_numpy()
+    codes, names = pd.factorize(users, use_na_sentinel=True)
+    return codes.astype(np.int64), np.asarray(names)
+
+def _run_bounds(is_start):
+    """구간 시작 여부 불리언 배열 -> (시작 위치, 길이) 배열"""
+    starts = np.flatnonzero(is_start)
+    return starts, np.diff(np.append(starts, len(is_start)))
+
+def conversation_stats(df, gap_minutes=SESSION_GAP_MINUTES):
+    """시간순 Date/User 배열에서 대화 세션, 사용자별 답장 속도, 시작/마무리 횟수, 연속 기록을 계산
+
+    - 세션: 직전 메시지와 gap_minutes 이상 떨어지면 새 대화 (2개 이상 메시지가 오간 세션만 '대화'로 셈)
+    - 답장: 같은 세션 안에서 직전 메시지와 보낸 사람이 바뀐 메시지, 답장 속도는 그 사이 시간
+    - 연속 메시지: 한 사람이 끊기지 않고 이어서 보낸 메시지 수
+    - 연속 대화일: 하루도 빠짐없이 대화가 있었던 가장 긴 기간
+    """
+    dates = df['Date'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+    codes, names = _user_codes(df['User'])
+    n = len(dates)
+    users = pd.DataFrame(0, index=pd.Index(names, name='User'),
+                         columns=['replies', 'median_reply_seconds', 'starts', 'ends', 'longest_run'])
+    stats = {'conversations': 0, 'median_conversation_msgs': 0, 'longest_conversation': None,
+             'day_streak': None, 'users': users}
+    if n == 0: return stats
+
+    gaps = np.diff(dates)
+    new_session = np.empty(n, dtype=bool)
+    new_session[0] = True
+    new_session[1:] = gaps > gap_minutes * 60 * 10 ** 9
+
+    # 대화 세션과 시작/마무리한 사람
+    session_starts, session_lens = _run_bounds(new_session)
+    is_conversation = session_lens > 1
+    starts, lens = session_starts[is_conversation], session_lens[is_conversation]
+    ends = starts + lens - 1
+    n_users = len(names)
+    users['starts'] = np.bincount(codes[starts][codes[starts] >= 0], minlength=n_users)
+    users['ends'] = np.bincount(codes[ends][codes[ends] >= 0], minlength=n_users)
+    if len(starts):
+        longest = int(np.argmax(lens))
+        stats['conversations'] = len(starts)
+        stats['median_conversation_msgs'] = float(np.median(lens))
+        stats['longest_conversation'] = {
+            'start': pd.Timestamp(dates[starts[longest]]), 'messages': int(lens[longest]),
+            'minutes': int((dates[ends[longest]] - dates[starts[longest]]) // (60 * 10 ** 9)),
+        }
+
+    # 답장 속도 (사용자별 중앙값)
+    is_reply = ~new_session[1:] & (codes[1:] != codes[:-1]) & (codes[1:] >= 0)
+    repliers = codes[1:][is_reply]
+    users['replies'] = np.bincount(repliers, minlength=n_users)
+    # 이미 정수 코드이므로 Categorical로 감싸서 groupby가 다시 해시하지 않게 함
+    by_user = pd.Categorical.from_codes(repliers, categories=range(n_users))
+    users['median_reply_seconds'] = pd.Series(gaps[is_reply] / 1e9).groupby(by_user, observed=False).median().to_numpy()
+
+    # 한 사람이 이어서 보낸 최장 연속 메시지
+    run_starts, run_lens = _run_bounds(np.r_[True, codes[1:] != codes[:-1]] | new_session)
+    run_users = codes[run_starts]
+    longest_run = np.zeros(n_users, dtype=np.int64)
+    np.maximum.at(longest_run, run_users[run_users >= 0], run_lens[run_users >= 0])
+    users['longest_run'] = longest_run
+
+    # 하루도 빠짐없이 대화한 최장 기간
+    days = dates // DAY_NS
+    days = days[np.r_[True, days[1:] != days[:-1]]]   # 시간순이므로 정렬 없이 고유한 날짜만 남김
+    streak_starts, streak_lens = _run_bounds(np.r_[True, np.diff(days) != 1])
+    best = int(np.argmax(streak_lens))
+    first_day = days[streak_starts[best]]
+    stats['day_streak'] = {'days': int(streak_lens[best]), 'start': pd.Timestamp(first_day * DAY_NS),
+                           'end': pd.Timestamp((first_day + streak_lens[best] - 1) * DAY_NS)}
+    return stats
+
+# -----------------------------------------------------------------------------
+# 3. 카드 / 프롬프트용 요약
+# -----------------------------------------------------------------------------
+def format_duration(seconds):
+    """초를 '45초', '3분', '1시간 20분' 형태로 표시"""
+    if seconds is None or pd.isna(seconds): return "-"
+    seconds = int(round(seconds))
+    if seconds < 60: return f"{seconds}초"
+    if seconds < 3600: return f"{seconds // 60}분"
+    hours, minutes = divmod(seconds // 60, 60)
+    return f"{hours}시간 {minutes}분" if minutes else f"{hours}시간"
+
+def reply_speed_ranking(stats, min_replies=MIN_REPLIES):
+    """답장을 min_replies번 이상 한 사용자의 답장 속도 중앙값 (빠른 순)"""
+    users = stats['users']
+    return users.loc[users['replies'] >= min_replies, 'median_reply_seconds'].sort_values(kind='stable')
+
+def user_features(stats, user):
+    """성격 분석 프롬프트에 넣을 사용자 한 명의 대화 습관 수치 (한 줄)"""
+    users = stats['users']
+    if user not in users.index: return ""
+    row = users.loc[user]
+    parts = []
+    if row['replies'] >= MIN_REPLIES:
+        ranking = reply_speed_ranking(stats)
+        parts.append(f"답장 속도(중앙값) {format_duration(row['median_reply_seconds'])}"
+                     f" ({len(ranking)}명 중 {ranking.index.get_loc(user) + 1}위로 빠름)")
+    parts.append(f"대화 시작 {int(row['starts'])}회 / 마무리 {int(row['ends'])}회 (전체 대화 {stats['conversations']}회)")
+    parts.append(f"혼자 연속으로 보낸 최대 메시지 {int(row['longest_run'])}개")
+    return ", ".join(parts)